@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.api import deps
 from app.models.chat import ChatQuery, ChatSession, ChatResultsUpdate
 from app.services.chat_service import chat_service
@@ -40,3 +40,18 @@ async def update_session_results(session_id: str, update: ChatResultsUpdate, use
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
+
+
+@router.get("/{session_id}/results")
+async def get_session_results(
+    session_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    user_id: str = Depends(deps.get_current_user)
+):
+    """Get a page of a search session's results."""
+    result = await chat_service.get_session_results(session_id, user_id, offset, limit)
+    if "error" in result:
+        status = 404 if result["error"] == "Session not found" else 400
+        raise HTTPException(status_code=status, detail=result["error"])
+    return result
@@ -1,36 +1,78 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from app.api import deps
 from app.models.knowledge import SavedResult, SourceUpdate
 from app.services.knowledge_service import knowledge_service
-from exa_py import Exa
+from app.services.ingestion_service import ingestion_service
+from app.services.result_store import result_store
 from app.core.config import settings
 
 router = APIRouter()
-exa = Exa(api_key=settings.EXA_API_KEY)
+_exa = None
+
+def get_exa():
+    global _exa
+    if _exa is None:
+        from exa_py import Exa
+        _exa = Exa(api_key=settings.EXA_API_KEY)
+    return _exa
 
 @router.get("/exa-search")
 async def exa_search(query: str, user_id: str = Depends(deps.get_current_user)):
     try:
-        result = exa.search_and_contents(
+        result = jsonable_encoder(get_exa().search_and_contents(
             query,
             category="research paper",
             num_results=15,
             text=True,
             type="auto"
-        )
+        ))
+        # Search sessions and saves reference these bodies by URL
+        await result_store.put_many(result.get("results") or [])
         return result
     except Exception as e:
         # In production, log this properly
         return {"error": str(e)}
 
 @router.get("/saved-results")
-async def get_results(user_id: str = Depends(deps.get_current_user)):
-    return await knowledge_service.get_results(user_id)
+async def get_results(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    after: str | None = None,
+    fields: str | None = None,
+    tag: list[str] | None = Query(None),
+    favorite: bool | None = None,
+    user_id: str = Depends(deps.get_current_user)
+):
+    """
+    Page through saved results (newest first, without full text unless
+    requested via `fields`). Repeated `tag` parameters match results
+    carrying any of the tags, like RetrievalFilters.tags in chat. Answers
+    304 when the library is unchanged.
+    """
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    version = await knowledge_service.get_version(user_id)
+    etag = knowledge_service.listing_etag(user_id, version, {
+        "limit": limit, "after": after, "fields": field_list, "tag": tag, "favorite": favorite
+    })
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    page = await knowledge_service.get_results(user_id, limit, after, field_list, tag, favorite)
+    page["version"] = version
+    return page
 
 @router.post("/saved-results")
 async def save_result(result: SavedResult, user_id: str = Depends(deps.get_current_user)):
     return await knowledge_service.save_result(result, user_id)
 
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user_id: str = Depends(deps.get_current_user)):
+    return await ingestion_service.get_job(job_id, user_id)
+
 @router.put("/saved-results/{id}")
 async def update_result(id: str, update: SourceUpdate, user_id: str = Depends(deps.get_current_user)):
     return await knowledge_service.update_result(id, update, user_id)
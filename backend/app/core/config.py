@@ -13,11 +13,62 @@ class Settings(BaseSettings):
     
     # Database
     MONGO_DETAILS: str = "mongodb://localhost:27017"
+
+    # Vector Index (shared by all workers, one writer at a time)
+    VECTOR_INDEX_DIR: str = "vector_index"
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"  # changing this requires scripts/reindex_vectors.py
+    CHUNK_SIZE: int = 1500      # characters per embedded chunk
+    CHUNK_OVERLAP: int = 200
+
+    EAGER_WARMUP: bool = True   # load + exercise models in the background at startup
+
+    # Reranking (cross-encoder second stage over a wider dense candidate set)
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    # Defaults sized for CPU scoring; more candidates or longer inputs need a GPU
+    RERANK_CANDIDATES: int = 20
+    RERANK_TOP_K: int = 3
+    RERANK_MAX_LENGTH: int = 256  # tokens per (query, chunk) pair; the rest of the chunk is cut
+    RERANK_BUDGET_MS: int = 500  # fall back to dense order when exceeded
+    RERANK_CACHE_SIZE: int = 4096
+
+    # Multi-query retrieval (question + recent turns, fused by reciprocal rank)
+    MULTI_QUERY_ENABLED: bool = False
+    MULTI_QUERY_TURNS: int = 2       # earlier user turns combined with the question
+    MULTI_QUERY_RRF_K: int = 60
+
+    # Search result store (bodies shared across sessions, keyed by URL hash)
+    RESULT_STORE_COMPRESS: bool = True  # zlib-compress texts of 1 KB and up
+
+    # Near-duplicate detection when saving papers
+    DEDUP_ENABLED: bool = True
+    DEDUP_JACCARD_THRESHOLD: float = 0.8    # MinHash estimate over 5-word shingles
+    DEDUP_EMBEDDING_THRESHOLD: float = 0.95  # cosine between document centroids
+
+    # Ingestion Queue (background embedding of saved papers)
+    INGESTION_PROCESSES: int = 2
+    INGESTION_BATCH_SIZE: int = 16
+    INGESTION_MAX_ATTEMPTS: int = 5
+    INGESTION_RETRY_BASE_SECONDS: float = 2.0
+    INGESTION_POLL_SECONDS: float = 1.0
+    INGESTION_LEASE_SECONDS: int = 300  # reclaim jobs from crashed workers after this
     
     # External APIs
     ANTHROPIC_API_KEY: str
     EXA_API_KEY: str
     CLAUDE_MODEL: str = "claude-haiku-4-5-20251001"
+    ANTHROPIC_BASE_URL: str | None = None  # e.g. scripts/fake_anthropic.py for load tests
+
+    # LLM Gateway (limits are per app process; divide tier limits by worker count)
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_REQUESTS_PER_MINUTE: int = 50
+    LLM_INPUT_TOKENS_PER_MINUTE: int = 50000
+    LLM_OUTPUT_TOKENS_PER_MINUTE: int = 10000
+    LLM_MAX_RETRIES: int = 4
+    LLM_RETRY_BASE_SECONDS: float = 1.0
+    LLM_RETRY_MAX_SECONDS: float = 30.0
+    LLM_BREAKER_THRESHOLD: int = 5         # consecutive failures before failing fast
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
     
     # CORS
     ALLOWED_ORIGINS: list[str] = ["http://localhost:5173", "http://localhost:8000"]
@@ -1,16 +1,28 @@
+import time
+_import_started = time.perf_counter()
+
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.core.database import db
 from app.api.v1 import auth, chat, knowledge
+from app.services.ingestion_service import ingestion_service
+from app.services.warmup_service import warmup_service
+from app.services.llm_gateway import llm_gateway
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     # db.connect() is handled in __init__
+    # Index/model loading runs in the background; /ready reports when it is done
+    warmup_service.start(import_seconds=_import_seconds)
+    ingestion_service.start()
     yield
     # Shutdown
+    await warmup_service.stop()
+    await ingestion_service.stop()
     db.close()
 
 app = FastAPI(
@@ -36,3 +48,16 @@ app.include_router(knowledge.router, prefix=f"{settings.API_V1_STR}/knowledge",
 @app.get("/")
 async def root():
     return {"status": "online", "message": "Research AI Backend v2 (Clean Arch)"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the vector index (and warmed-up model) are loaded."""
+    status = warmup_service.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Operational counters: LLM gateway queue depth, wait times, retries and circuit state."""
+    return {"llm": llm_gateway.metrics()}
+
+_import_seconds = time.perf_counter() - _import_started
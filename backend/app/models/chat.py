@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from enum import Enum
 
@@ -22,6 +23,14 @@ class AssistantMode(str, Enum):
     GENERAL = "general"  # General purpose assistant
 
 
+class RetrievalFilters(BaseModel):
+    """Restricts which saved papers RAG search may retrieve."""
+    tags: list[str] | None = None      # Papers carrying any of these tags, as in GET /saved-results
+    favorites_only: bool = False
+    saved_after: datetime | None = None   # inclusive; without a timezone means UTC
+    saved_before: datetime | None = None  # exclusive
+
+
 class ChatSession(BaseModel):
     title: str
     category: str = SessionCategory.CONVERSATION
@@ -40,3 +49,4 @@ class ChatQuery(BaseModel):
     question: str
     session_id: str | None = None
     mode: str = AssistantMode.THESIS
+    filters: RetrievalFilters | None = None
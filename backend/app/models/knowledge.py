@@ -1,3 +1,4 @@
+from enum import Enum
 from pydantic import BaseModel
 
 class SavedResult(BaseModel):
@@ -14,3 +15,11 @@ class SourceUpdate(BaseModel):
     tags: list[str] | None = None
     is_favorite: bool | None = None
     note: str | None = None
+
+class IngestionStatus(str, Enum):
+    """Lifecycle of a background embedding job."""
+    PENDING = "pending"  # Waiting for a worker (or for its retry backoff)
+    RUNNING = "running"  # Claimed by a worker
+    DONE = "done"        # Indexed (or document no longer exists)
+    FAILED = "failed"    # Gave up after max attempts
+    DUPLICATE = "duplicate"  # Linked to a near-identical indexed paper (duplicate_of) instead
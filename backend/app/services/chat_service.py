@@ -1,6 +1,5 @@
 from datetime import datetime
 from bson import ObjectId
-from anthropic import AsyncAnthropic
 from app.core.config import settings
 from app.core.database import db
 from app.models.chat import ChatQuery, AssistantMode
@@ -8,11 +7,12 @@ from app.services.vector_service import get_vector_service
 from app.services.prompt_builder import prompt_builder
 from app.services.context_builder import context_builder
 from app.services.query_classifier import query_classifier
+from app.services.llm_gateway import llm_gateway
+from app.services.result_store import result_store
 
 
 class ChatService:
     def __init__(self):
-        self.client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
         self.collection = db.get_collection("chat_sessions")
         self.vector_service = get_vector_service()
 
@@ -33,13 +33,15 @@ class ChatService:
                 session_mode = session.get("mode", AssistantMode.THESIS)
 
         # 2. Classify query intent
-        context_need = await query_classifier.classify(query.question, conversation_history)
+        context_need = await query_classifier.classify(query.question, conversation_history, user_id)
 
         # 3. Build context based on intent
         library_context, rag_context, source_titles = await context_builder.build(
             query.question,
             user_id,
-            context_need=context_need
+            context_need=context_need,
+            filters=query.filters,
+            conversation_history=conversation_history
         )
 
         # 4. Build system prompt using session's mode
@@ -52,8 +54,9 @@ class ChatService:
             messages.append({"role": role, "content": msg.get("text", "")})
         messages.append({"role": "user", "content": query.question})
 
-        # 6. Call LLM
-        response = await self.client.messages.create(
+        # 6. Call LLM (queued and rate-limited per user by the gateway)
+        response = await llm_gateway.create(
+            user_id,
             model=settings.CLAUDE_MODEL,
             max_tokens=8192,
             system=system_message,
@@ -88,8 +91,9 @@ class ChatService:
         if category:
             query["category"] = category
 
+        # Search results are loaded per session via get_session_results
         sessions = []
-        async for session in self.collection.find(query).sort("created_at", -1):
+        async for session in self.collection.find(query, {"results": 0, "result_refs": 0}).sort("created_at", -1):
             session["id"] = str(session["_id"])
             del session["_id"]
             sessions.append(session)
@@ -114,16 +118,52 @@ class ChatService:
         return {"message": "Session deleted"}
 
     async def update_session_results(self, session_id: str, user_id: str, results: list):
-        """Update search results for a session (used by EXA search)."""
+        """
+        Point a search session at its results (used by EXA search).
+
+        Only results the server fetched via /knowledge/exa-search are
+        referenced; anything else in the client's list is dropped.
+        """
         try:
             obj_id = ObjectId(session_id)
         except:
             return {"error": "Invalid ID"}
+        # Bodies were stored when the server fetched them; keep references only
+        refs = await result_store.refs_for(results)
         await self.collection.update_one(
             {"_id": obj_id, "user_id": user_id},
-            {"$set": {"results": results}}
+            {"$set": {"result_refs": refs}, "$unset": {"results": ""}}
         )
         return {"message": "Results updated"}
 
+    async def get_session_results(self, session_id: str, user_id: str, offset: int = 0, limit: int = 50):
+        """Get a page of a search session's results from the result store."""
+        try:
+            obj_id = ObjectId(session_id)
+        except:
+            return {"error": "Invalid ID"}
+        session = await self.collection.find_one(
+            {"_id": obj_id, "user_id": user_id},
+            {"result_refs": {"$slice": [offset, limit]}, "results": {"$slice": [offset, limit]}}
+        )
+        if not session:
+            return {"error": "Session not found"}
+
+        if "result_refs" in session:
+            results = await result_store.get_many(session["result_refs"])
+            total_field = "$result_refs"
+        else:
+            # Sessions saved before the result store embed their results
+            results = session.get("results", [])
+            total_field = "$results"
+
+        total = 0
+        async for row in self.collection.aggregate([
+            {"$match": {"_id": obj_id}},
+            {"$project": {"total": {"$size": {"$ifNull": [total_field, []]}}}}
+        ]):
+            total = row["total"]
+        return {"results": results, "total": total}
+
 
 chat_service = ChatService()
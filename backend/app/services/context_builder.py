@@ -1,13 +1,23 @@
+import asyncio
+from app.core.config import settings
 from app.services.vector_service import get_vector_service
 from app.services.knowledge_service import knowledge_service
-from app.models.chat import ContextNeed
+from app.services.reranker import reranker
+from app.models.chat import ContextNeed, RetrievalFilters
 
 class ContextBuilder:
 
     def __init__(self):
         self.vector_service = get_vector_service()
 
-    async def build(self, query: str, user_id: str, context_need: ContextNeed = ContextNeed.HIGH) -> tuple[str, str, list]:
+    async def build(
+        self,
+        query: str,
+        user_id: str,
+        context_need: ContextNeed = ContextNeed.HIGH,
+        filters: RetrievalFilters | None = None,
+        conversation_history: list | None = None
+    ) -> tuple[str, str, list]:
         # If no context needed, return empty strings
         if context_need == ContextNeed.NONE:
             return "", "", []
@@ -23,7 +33,19 @@ class ContextBuilder:
             return library_context, "", []
 
         # 2. RAG Search (only for MEDIUM and HIGH context needs)
-        search_results = self.vector_service.search(query, user_id, n_results=5)
+        # Encoding, refresh and scoring block, so they run off the event loop
+        n_results = settings.RERANK_CANDIDATES if settings.RERANK_ENABLED else 5
+        if settings.MULTI_QUERY_ENABLED:
+            sub_queries = self._sub_queries(query, conversation_history or [])
+            search_results = await asyncio.to_thread(
+                self.vector_service.search_many, sub_queries, user_id, n_results=n_results, filters=filters
+            )
+        else:
+            search_results = await asyncio.to_thread(
+                self.vector_service.search, query, user_id, n_results=n_results, filters=filters
+            )
+        if settings.RERANK_ENABLED:
+            search_results = await reranker.rerank(query, search_results, settings.RERANK_TOP_K)
 
         # 3. Build RAG Context
         source_texts = []
@@ -43,4 +65,20 @@ class ContextBuilder:
 
         return library_context, rag_context, source_titles
 
+    @staticmethod
+    def _sub_queries(question: str, conversation_history: list) -> list[str]:
+        """
+        The question itself plus the question read in the context of each of
+        the last MULTI_QUERY_TURNS user turns, so follow-ups like "what about
+        the second approach?" still find the papers the conversation is about.
+        """
+        MAX_TURN_LEN = 500
+        queries = [question]
+        turns = [m.get("text", "") for m in conversation_history if m.get("role") == "user"]
+        for turn in reversed(turns[-settings.MULTI_QUERY_TURNS:]):
+            turn = turn.strip()[:MAX_TURN_LEN]
+            if turn and turn != question:
+                queries.append(f"{turn} {question}")
+        return queries
+
 context_builder = ContextBuilder()
\ No newline at end of file
@@ -0,0 +1,87 @@
+import hashlib
+import re
+import zlib
+import numpy as np
+from pymongo import ASCENDING
+from app.core.config import settings
+from app.core.database import db
+
+
+class DedupService:
+    """
+    Near-duplicate detection for saved papers.
+
+    Each text gets a MinHash signature over 5-word shingles, split into LSH
+    bands stored on the document (`minhash`, `lsh_bands`). A new paper is a
+    near-duplicate when it shares a band with an earlier paper of the same
+    user and their estimated Jaccard similarity reaches
+    DEDUP_JACCARD_THRESHOLD. Duplicates are linked to the earlier paper via
+    `duplicate_of` and never embedded or indexed. The ingestion worker also
+    catches reworded copies by embedding similarity before indexing
+    (DEDUP_EMBEDDING_THRESHOLD).
+    """
+
+    NUM_PERM = 128
+    BANDS = 16           # 16 bands x 8 rows: ~95% chance to surface a pair at Jaccard 0.8
+    SHINGLE_SIZE = 5
+    _PRIME = (1 << 31) - 1
+
+    def __init__(self):
+        self.collection = db.get_collection("saved_research")
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, self._PRIME, self.NUM_PERM, dtype=np.uint64)
+        self._b = rng.integers(0, self._PRIME, self.NUM_PERM, dtype=np.uint64)
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        await self.collection.create_index([("user_id", ASCENDING), ("lsh_bands", ASCENDING)])
+        await self.collection.create_index("duplicate_of", sparse=True)
+        self._indexes_ready = True
+
+    def signature(self, text: str) -> np.ndarray:
+        words = re.findall(r"\w+", text.lower())
+        n = self.SHINGLE_SIZE
+        shingles = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        hashes = np.array([zlib.crc32(s.encode()) for s in shingles], dtype=np.uint64)
+        # h_i(x) = (a_i * x + b_i) mod p, minimised over all shingles
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % self._PRIME).min(axis=1)
+
+    def bands(self, signature: np.ndarray) -> list[str]:
+        rows = self.NUM_PERM // self.BANDS
+        return [
+            f"{i}:{hashlib.md5(signature[i * rows:(i + 1) * rows].tobytes()).hexdigest()[:16]}"
+            for i in range(self.BANDS)
+        ]
+
+    def fields(self, text: str) -> dict:
+        """Dedup fields to store on a saved_research document."""
+        signature = self.signature(text)
+        return {"minhash": signature.tolist(), "lsh_bands": self.bands(signature)}
+
+    @staticmethod
+    def similarity(a, b) -> float:
+        """Estimated Jaccard similarity of two MinHash signatures."""
+        return float(np.mean(np.asarray(a) == np.asarray(b)))
+
+    async def find_duplicate(self, user_id: str, fields: dict, exclude_id=None):
+        """Return the user's earlier paper this one near-duplicates, or None."""
+        await self._ensure_indexes()
+        query = {
+            "user_id": user_id,
+            "lsh_bands": {"$in": fields["lsh_bands"]},
+            "duplicate_of": {"$exists": False}
+        }
+        if exclude_id is not None:
+            query["_id"] = {"$ne": exclude_id}
+
+        best, best_score = None, settings.DEDUP_JACCARD_THRESHOLD
+        async for doc in self.collection.find(query, {"minhash": 1, "title": 1, "url": 1}):
+            score = self.similarity(fields["minhash"], doc["minhash"])
+            if score >= best_score:
+                best, best_score = doc, score
+        return best
+
+
+dedup_service = DedupService()
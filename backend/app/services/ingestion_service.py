@@ -0,0 +1,323 @@
+import asyncio
+import fcntl
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, ReturnDocument
+from app.core.config import settings
+from app.core.database import db
+from app.models.knowledge import IngestionStatus
+from app.services.vector_service import get_vector_service, encode_batch, content_hash, FILTER_FIELDS
+
+
+class IngestionService:
+    """
+    Durable queue for embedding saved papers outside the request path.
+
+    Jobs live in the `ingestion_jobs` collection, one per document id, so
+    re-enqueueing a document is idempotent. The worker loop claims due jobs
+    atomically, embeds their chunks in a process pool and indexes the whole
+    batch as one vector index generation. Failed jobs are retried with
+    exponential backoff and jitter.
+
+    Only one app process per host runs the loop and its pool (each pool
+    process holds a copy of the model): the holder of a file lock next to
+    the vector index. The other workers only enqueue, and take over when
+    the leader exits.
+    """
+
+    LEADER_RETRY_SECONDS = 10
+
+    def __init__(self):
+        self.jobs = db.get_collection("ingestion_jobs")
+        self.documents = db.get_collection("saved_research")
+        self.versions = db.get_collection("library_versions")
+        self.vector_service = get_vector_service()
+        self._executor = None
+        self._task = None
+        self._leader_lock = None
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        await self.jobs.create_index("doc_id", unique=True)
+        await self.jobs.create_index([("status", ASCENDING), ("next_run_at", ASCENDING)])
+        self._indexes_ready = True
+
+    async def enqueue(self, doc_id: str, user_id: str) -> str:
+        """Queue a document for (re-)indexing and return the job id."""
+        await self._ensure_indexes()
+        now = datetime.utcnow()
+        job = await self.jobs.find_one_and_update(
+            {"doc_id": doc_id},
+            {
+                "$set": {
+                    "status": IngestionStatus.PENDING.value,
+                    "attempts": 0,
+                    "error": None,
+                    "next_run_at": now,
+                    "updated_at": now
+                },
+                "$setOnInsert": {"user_id": user_id, "created_at": now},
+                "$unset": {"duplicate_of": ""}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return str(job["_id"])
+
+    async def get_job(self, job_id: str, user_id: str):
+        try:
+            obj_id = ObjectId(job_id)
+        except:
+            raise HTTPException(status_code=400, detail="Invalid ID")
+
+        job = await self.jobs.find_one({"_id": obj_id, "user_id": user_id})
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {
+            "id": str(job["_id"]),
+            "doc_id": job["doc_id"],
+            "status": job["status"],
+            "attempts": job.get("attempts", 0),
+            "error": job.get("error"),
+            "duplicate_of": job.get("duplicate_of"),
+            "updated_at": job["updated_at"].isoformat()
+        }
+
+    async def cancel(self, doc_id: str, user_id: str):
+        await self.jobs.delete_one({"doc_id": doc_id, "user_id": user_id})
+
+    def start(self):
+        """Start the worker loop. Called from the app lifespan."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._leader_lock:
+            self._leader_lock.close()  # releases the flock
+            self._leader_lock = None
+
+    def _try_lead(self) -> bool:
+        """Take the host-wide ingestion leader lock without blocking."""
+        if self._leader_lock is None:
+            os.makedirs(settings.VECTOR_INDEX_DIR, exist_ok=True)
+            lock_file = open(os.path.join(settings.VECTOR_INDEX_DIR, ".ingestion.lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+            self._leader_lock = lock_file
+            print(f"Ingestion worker running in process {os.getpid()}")
+        return True
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # spawn: forking a process that already runs an event loop and Mongo threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.INGESTION_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _run(self):
+        while not self._try_lead():
+            await asyncio.sleep(self.LEADER_RETRY_SECONDS)
+        await self._ensure_indexes()
+        while True:
+            try:
+                jobs = await self._claim_batch()
+                if not jobs:
+                    await asyncio.sleep(settings.INGESTION_POLL_SECONDS)
+                    continue
+                await self._process_batch(jobs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Ingestion worker error: {e}")
+                await asyncio.sleep(settings.INGESTION_POLL_SECONDS)
+
+    async def _claim_batch(self) -> list[dict]:
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=settings.INGESTION_LEASE_SECONDS)
+        jobs = []
+        for _ in range(settings.INGESTION_BATCH_SIZE):
+            job = await self.jobs.find_one_and_update(
+                {"$or": [
+                    {"status": IngestionStatus.PENDING.value, "next_run_at": {"$lte": now}},
+                    {"status": IngestionStatus.RUNNING.value, "locked_at": {"$lt": lease_expired}}
+                ]},
+                {
+                    "$set": {"status": IngestionStatus.RUNNING.value, "locked_at": now, "updated_at": now},
+                    "$inc": {"attempts": 1}
+                },
+                sort=[("next_run_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                break
+            jobs.append(job)
+        return jobs
+
+    async def _process_batch(self, jobs: list[dict]):
+        docs = {}
+        cursor = self.documents.find(
+            {"_id": {"$in": [ObjectId(j["doc_id"]) for j in jobs]}, "duplicate_of": {"$exists": False}},
+            {"title": 1, "text": 1, "user_id": 1, "tags": 1, "is_favorite": 1, "saved_at": 1}
+        )
+        async for doc in cursor:
+            docs[str(doc["_id"])] = doc
+
+        indexed = await asyncio.to_thread(self.vector_service.indexed_hashes)
+        items = []
+        inputs = []
+        unchanged = []
+        for job in jobs:
+            doc = docs.get(job["doc_id"])
+            if not doc or not doc.get("text"):
+                continue  # Deleted before we got to it, or nothing to embed
+            title = doc.get("title") or "Untitled"
+            doc_hash = content_hash(title, doc["text"])
+            if indexed.get(job["doc_id"]) == (self.vector_service.model_name, doc_hash):
+                # Already indexed with this model and content; tags may still have changed
+                unchanged.append({"id": job["doc_id"], "user_id": doc["user_id"]})
+                continue
+            chunks, chunk_inputs = self.vector_service.chunk_inputs(title, doc["text"])
+            items.append({
+                "id": job["doc_id"],
+                "user_id": doc["user_id"],
+                "title": title,
+                "chunks": chunks,
+                "content_hash": doc_hash,
+                "metadata": doc
+            })
+            inputs.extend(chunk_inputs)
+
+        try:
+            if items:
+                embeddings = await self._encode(inputs)
+                offset = 0
+                for item in items:
+                    item["embeddings"] = embeddings[offset:offset + len(item["chunks"])]
+                    offset += len(item["chunks"])
+                if settings.DEDUP_ENABLED:
+                    items = await self._link_embedding_duplicates(items)
+                await asyncio.to_thread(self.vector_service.upsert_many, items)
+            await self._sync_documents(items + unchanged)
+        except Exception as e:
+            print(f"Ingestion batch failed: {e}")
+            for job in jobs:
+                await self._retry_or_fail(job, str(e))
+            return
+
+        await self.jobs.update_many(
+            {"_id": {"$in": [j["_id"] for j in jobs]}, "status": IngestionStatus.RUNNING.value},
+            {"$set": {"status": IngestionStatus.DONE.value, "error": None, "updated_at": datetime.utcnow()}}
+        )
+
+    async def _sync_documents(self, items: list[dict]):
+        """
+        Bring the index in line with changes made while the batch was embedding.
+
+        The batch read its documents before encoding, so a paper deleted
+        meanwhile was just re-added by upsert_many, and tags or favourites
+        changed meanwhile were overwritten with the old values. Re-reading
+        after the upsert catches both; delete_result and update_result handle
+        changes that land after this read themselves.
+        """
+        if not items:
+            return
+        docs = {}
+        cursor = self.documents.find(
+            {"_id": {"$in": [ObjectId(item["id"]) for item in items]}},
+            {"tags": 1, "is_favorite": 1, "saved_at": 1}
+        )
+        async for doc in cursor:
+            docs[str(doc["_id"])] = doc
+        for item in items:
+            doc = docs.get(item["id"])
+            if doc is None:
+                print(f"{item['id']} was deleted during ingestion, removing its vectors")
+                await asyncio.to_thread(self.vector_service.delete, item["id"], item["user_id"])
+            else:
+                metadata = {k: doc.get(k) for k in FILTER_FIELDS}
+                await asyncio.to_thread(self.vector_service.update_metadata, item["id"], item["user_id"], metadata)
+
+    async def _link_embedding_duplicates(self, items: list[dict]) -> list[dict]:
+        """Link papers whose embeddings match an indexed paper instead of indexing them."""
+        unique = []
+        for item in items:
+            duplicate_id = await asyncio.to_thread(
+                self.vector_service.find_near_duplicate,
+                item["user_id"], item["embeddings"], settings.DEDUP_EMBEDDING_THRESHOLD, item["id"]
+            )
+            if duplicate_id:
+                print(f"{item['id']} is a near-duplicate of {duplicate_id}, not indexing")
+                await self.documents.update_one(
+                    {"_id": ObjectId(item["id"])},
+                    {"$set": {"duplicate_of": duplicate_id}}
+                )
+                # Surface the link on the job, which the client polls
+                await self.jobs.update_one(
+                    {"doc_id": item["id"], "status": IngestionStatus.RUNNING.value},
+                    {"$set": {
+                        "status": IngestionStatus.DUPLICATE.value,
+                        "duplicate_of": duplicate_id,
+                        "error": None,
+                        "updated_at": datetime.utcnow()
+                    }}
+                )
+                await self.versions.update_one({"_id": item["user_id"]}, {"$inc": {"version": 1}}, upsert=True)
+                await asyncio.to_thread(self.vector_service.delete, item["id"], item["user_id"])
+            else:
+                unique.append(item)
+        return unique
+
+    async def _encode(self, texts: list[str]):
+        """Split the batch across the process pool and embed in parallel."""
+        loop = asyncio.get_running_loop()
+        n_parts = min(settings.INGESTION_PROCESSES, len(texts))
+        parts = [p.tolist() for p in np.array_split(np.array(texts, dtype=object), n_parts)]
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, encode_batch, self.vector_service.model_name, part)
+            for part in parts
+        ])
+        return np.vstack(results)
+
+    async def _retry_or_fail(self, job: dict, error: str):
+        attempts = job.get("attempts", 1)
+        now = datetime.utcnow()
+        if attempts >= settings.INGESTION_MAX_ATTEMPTS:
+            update = {"status": IngestionStatus.FAILED.value, "error": error, "updated_at": now}
+        else:
+            delay = settings.INGESTION_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+            delay *= random.uniform(0.5, 1.5)
+            update = {
+                "status": IngestionStatus.PENDING.value,
+                "error": error,
+                "next_run_at": now + timedelta(seconds=delay),
+                "updated_at": now
+            }
+        # Jobs already settled (linked as duplicates) keep their status
+        await self.jobs.update_one({"_id": job["_id"], "status": IngestionStatus.RUNNING.value}, {"$set": update})
+
+
+ingestion_service = IngestionService()
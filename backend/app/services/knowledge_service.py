@@ -1,13 +1,53 @@
+import asyncio
+import hashlib
 from bson import ObjectId
 from fastapi import HTTPException
+from pymongo import DESCENDING, ReturnDocument
 from app.core.database import db
 from app.models.knowledge import SavedResult, SourceUpdate
 from app.services.vector_service import get_vector_service
+from app.services.ingestion_service import ingestion_service
+from app.services.dedup_service import dedup_service
+from app.services.result_store import result_store
+from app.core.config import settings
 
 class KnowledgeService:
+    # Fields a listing may select; text is only returned when asked for
+    LISTING_FIELDS = {"title", "url", "text", "saved_at", "tags", "is_favorite", "note", "duplicate_of"}
+    MAX_PAGE_SIZE = 200
+
     def __init__(self):
         self.collection = db.get_collection("saved_research")
+        self.versions = db.get_collection("library_versions")
         self.vector_service = get_vector_service()
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        await self.collection.create_index([("user_id", 1), ("_id", DESCENDING)])
+        await self.collection.create_index([("user_id", 1), ("tags", 1)])
+        self._indexes_ready = True
+
+    async def get_version(self, user_id: str) -> int:
+        """Per-user library version, bumped on every change to the listing."""
+        doc = await self.versions.find_one({"_id": user_id})
+        return doc["version"] if doc else 0
+
+    async def _bump_version(self, user_id: str) -> int:
+        doc = await self.versions.find_one_and_update(
+            {"_id": user_id},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["version"]
+
+    @staticmethod
+    def listing_etag(user_id: str, version: int, params: dict) -> str:
+        """Weak ETag for one listing page: library version + the query that produced it."""
+        key = f"{user_id}|" + "|".join(f"{k}={params[k]}" for k in sorted(params))
+        return f'W/"{version}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"'
 
     async def save_result(self, result: SavedResult, user_id: str):
         # Check duplicate
@@ -15,31 +55,102 @@ class KnowledgeService:
         if existing:
             return {"message": "Result already saved", "id": str(existing["_id"])}
 
+        # Text already fetched by a search is in the result store; no need to resend it
+        if not result.text:
+            result.text = await result_store.get_text(result.url)
+
         res_dict = result.model_dump()
         res_dict["user_id"] = user_id
+
+        # Same paper from another URL (arXiv / DOI / publisher): link instead of re-embedding
+        duplicate = None
+        if result.text and settings.DEDUP_ENABLED:
+            res_dict.update(dedup_service.fields(result.text))
+            duplicate = await dedup_service.find_duplicate(user_id, res_dict)
+            if duplicate:
+                res_dict["duplicate_of"] = str(duplicate["_id"])
+
         new_res = await self.collection.insert_one(res_dict)
         doc_id = str(new_res.inserted_id)
+        await self._bump_version(user_id)
+
+        if duplicate:
+            return {
+                "message": f"Saved as a near-duplicate of \"{duplicate.get('title') or duplicate.get('url')}\"",
+                "id": doc_id,
+                "duplicate_of": str(duplicate["_id"])
+            }
+
+        # Embedding + indexing happens in the background ingestion workers
+        if not result.text:
+            return {"message": "Saved successfully", "id": doc_id}
 
-        # Upsert to Vector DB (Synchronous call, can be made async/celery later)
-        if result.text:
-             self.vector_service.upsert(doc_id, user_id, result.title or "Untitled", result.text)
+        job_id = await ingestion_service.enqueue(doc_id, user_id)
+        return {"message": "Saved successfully", "id": doc_id, "job_id": job_id}
 
-        return {"message": "Saved successfully", "id": doc_id}
+    async def get_results(
+        self,
+        user_id: str,
+        limit: int = 50,
+        after: str | None = None,
+        fields: list[str] | None = None,
+        tags: list[str] | None = None,
+        favorite: bool | None = None
+    ):
+        """
+        One page of a user's library, newest first.
+
+        Args:
+            limit: Page size (capped at MAX_PAGE_SIZE)
+            after: Cursor from the previous page's next_cursor
+            fields: Fields to return; defaults to everything except text
+            tags: Only results carrying any of these tags (same as RAG filters)
+            favorite: Only (non-)favorites
+
+        Returns:
+            {"items": [...], "next_cursor": str | None}
+        """
+        await self._ensure_indexes()
+        query = {"user_id": user_id}
+        if after:
+            try:
+                query["_id"] = {"$lt": ObjectId(after)}
+            except:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        if tags:
+            query["tags"] = {"$in": tags}
+        if favorite is not None:
+            query["is_favorite"] = favorite
+
+        if fields:
+            unknown = set(fields) - self.LISTING_FIELDS
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+            projection = {f: 1 for f in fields}
+        else:
+            projection = {"text": 0, "minhash": 0, "lsh_bands": 0}
+
+        limit = max(1, min(limit, self.MAX_PAGE_SIZE))
+        cursor = self.collection.find(query, projection).sort("_id", DESCENDING).limit(limit + 1)
 
-    async def get_results(self, user_id: str):
         results = []
-        async for res in self.collection.find({"user_id": user_id}):
+        async for res in cursor:
             res["id"] = str(res["_id"])
             del res["_id"]
             results.append(res)
-        return results
+
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = results[-1]["id"]
+        return {"items": results, "next_cursor": next_cursor}
 
     async def get_all_titles(self, user_id: str):
         """Fetch lightweight metadata for all saved sources (no content)."""
         results = []
         # Project only necessary fields
         cursor = self.collection.find(
-            {"user_id": user_id},
+            {"user_id": user_id, "duplicate_of": {"$exists": False}},
             {"title": 1, "saved_at": 1, "url": 1}
         ).sort("saved_at", -1)
         
@@ -67,6 +178,12 @@ class KnowledgeService:
         )
         if result.matched_count == 0:
              raise HTTPException(status_code=404, detail="Result not found")
+        await self._bump_version(user_id)
+
+        # Keep the filterable metadata in the vector index in sync
+        index_fields = {k: v for k, v in update_data.items() if k in ("tags", "is_favorite")}
+        if index_fields:
+            await asyncio.to_thread(self.vector_service.update_metadata, id, user_id, index_fields)
         return {"message": "Updated"}
 
     async def delete_result(self, id: str, user_id: str):
@@ -75,8 +192,28 @@ class KnowledgeService:
         except:
             raise HTTPException(status_code=400, detail="Invalid ID")
 
-        await self.collection.delete_one({"_id": obj_id, "user_id": user_id})
-        self.vector_service.delete(id, user_id)
+        deleted = await self.collection.delete_one({"_id": obj_id, "user_id": user_id})
+        if deleted.deleted_count:
+            await self._bump_version(user_id)
+            await self._promote_duplicate(id, user_id)
+            await ingestion_service.cancel(id, user_id)
+        await asyncio.to_thread(self.vector_service.delete, id, user_id)
         return {"message": "Deleted"}
 
+    async def _promote_duplicate(self, id: str, user_id: str):
+        """When a paper with linked duplicates is deleted, the oldest duplicate takes its place."""
+        successor = await self.collection.find_one(
+            {"user_id": user_id, "duplicate_of": id},
+            sort=[("_id", 1)]
+        )
+        if not successor:
+            return
+        successor_id = str(successor["_id"])
+        await self.collection.update_one({"_id": successor["_id"]}, {"$unset": {"duplicate_of": ""}})
+        await self.collection.update_many(
+            {"user_id": user_id, "duplicate_of": id},
+            {"$set": {"duplicate_of": successor_id}}
+        )
+        await ingestion_service.enqueue(successor_id, user_id)
+
 knowledge_service = KnowledgeService()
\ No newline at end of file
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import random
+import time
+from collections import OrderedDict, deque
+from fastapi import HTTPException
+from app.core.config import settings
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, rate_per_minute: int):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: float = 1.0):
+        """Wait until `amount` units are available, then consume them."""
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.level >= amount:
+                self.level -= amount
+                return
+            await asyncio.sleep((amount - self.level) / self.rate)
+
+    def debit(self, amount: float):
+        """Charge usage only known after the call (may go negative)."""
+        self._refill()
+        self.level -= amount
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and allows one trial call after `reset_seconds`."""
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_running = False
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class LLMGateway:
+    """
+    Single entry point for outbound Anthropic calls.
+
+    - Global concurrency cap with per-user round-robin queueing, so one user
+      firing many queries cannot starve the others.
+    - Token buckets for requests, input tokens and output tokens per minute,
+      matched to the API tier (limits are per process).
+    - Retries on 429/529/5xx and connection errors with jittered exponential
+      backoff, honouring retry-after.
+    - A circuit breaker that fails fast with 503 while the API is down.
+
+    Point ANTHROPIC_BASE_URL at scripts/fake_anthropic.py to exercise it locally.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504, 529}
+
+    def __init__(self):
+        self._client = None
+        self.max_concurrency = settings.LLM_MAX_CONCURRENCY
+        self.active = 0
+        self._waiters = OrderedDict()  # user_id -> deque of futures, in round-robin order
+        self.request_bucket = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE)
+        self.input_bucket = TokenBucket(settings.LLM_INPUT_TOKENS_PER_MINUTE)
+        self.output_bucket = TokenBucket(settings.LLM_OUTPUT_TOKENS_PER_MINUTE)
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_RESET_SECONDS)
+        self._wait_times = deque(maxlen=500)
+        self.counters = {"requests": 0, "retries": 0, "rate_limited": 0, "failures": 0, "rejected": 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            from anthropic import AsyncAnthropic
+            # Retries are handled here, not by the SDK
+            self._client = AsyncAnthropic(
+                api_key=settings.ANTHROPIC_API_KEY,
+                base_url=settings.ANTHROPIC_BASE_URL,
+                max_retries=0
+            )
+        return self._client
+
+    async def create(self, user_id: str | None = None, **kwargs):
+        """Queue, rate-limit and send a messages.create call on behalf of a user."""
+        if not self.breaker.allow():
+            self.counters["rejected"] += 1
+            raise HTTPException(status_code=503, detail="AI service temporarily unavailable, please retry shortly")
+
+        try:
+            response = await self._call_with_retry(user_id or "anonymous", kwargs)
+            self.output_bucket.debit(getattr(response.usage, "output_tokens", 0))
+            self.breaker.record_success()
+            return response
+        except Exception as e:
+            if self._is_outage(e):
+                self.counters["failures"] += 1
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()  # the API answered; the request was at fault
+            raise
+        except BaseException:
+            self.breaker.trial_running = False
+            raise
+
+    def _is_outage(self, error) -> bool:
+        from anthropic import APIConnectionError, APIStatusError
+
+        if isinstance(error, APIConnectionError):
+            return True
+        return isinstance(error, APIStatusError) and error.status_code in self.RETRY_STATUS
+
+    @staticmethod
+    def _estimate_input_tokens(kwargs) -> int:
+        # ~4 characters per token is close enough for admission control
+        size = len(json.dumps(kwargs.get("system", ""))) + len(json.dumps(kwargs.get("messages", [])))
+        return max(1, size // 4)
+
+    async def _call_with_retry(self, user_id: str, kwargs):
+        """
+        Send the call, retrying transient failures. Each attempt queues for a
+        concurrency slot and takes a request token; the slot is released
+        during the backoff so other users' calls run meanwhile.
+        """
+        from anthropic import APIConnectionError, APIStatusError
+
+        queued_at = time.monotonic()
+        attempt = 0
+        while True:
+            await self._acquire(user_id)
+            try:
+                await self.request_bucket.take(1)
+                if attempt == 0:
+                    # Token budgets are charged per call, not per attempt
+                    await self.input_bucket.take(self._estimate_input_tokens(kwargs))
+                    await self.output_bucket.take(0)
+                    self._wait_times.append(time.monotonic() - queued_at)
+                self.counters["requests"] += 1
+                return await self.client.messages.create(**kwargs)
+            except (APIStatusError, APIConnectionError) as e:
+                status = getattr(e, "status_code", None)
+                if status is not None and status not in self.RETRY_STATUS:
+                    raise
+                if status == 429:
+                    self.counters["rate_limited"] += 1
+                if attempt >= settings.LLM_MAX_RETRIES:
+                    raise
+                delay = self._backoff(attempt, e)
+            finally:
+                self._release()
+            attempt += 1
+            self.counters["retries"] += 1
+            print(f"LLM call failed ({status or type(e).__name__}), retry {attempt} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _backoff(attempt: int, error) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.LLM_RETRY_MAX_SECONDS) + random.uniform(0, 1)
+            except ValueError:
+                pass
+        # Full jitter
+        return random.uniform(0, min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+
+    async def _acquire(self, user_id: str):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # a slot was handed to us after all
+            else:
+                queue = self._waiters.get(user_id)
+                if queue and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._waiters[user_id]
+            raise
+
+    def _release(self):
+        """Hand the slot to the next user in round-robin order, or free it."""
+        while self._waiters:
+            user_id, queue = self._waiters.popitem(last=False)
+            future = queue.popleft()
+            if queue:
+                self._waiters[user_id] = queue  # back of the line
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def metrics(self) -> dict:
+        waits = sorted(self._wait_times)
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": sum(len(q) for q in self._waiters.values()),
+            "queued_users": len(self._waiters),
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                "max": round(waits[-1], 3) if waits else 0.0
+            },
+            "circuit": self.breaker.state,
+            **self.counters
+        }
+
+
+llm_gateway = LLMGateway()
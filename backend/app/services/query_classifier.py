@@ -1,6 +1,6 @@
 from app.models.chat import ContextNeed
 from app.core.config import settings
-from anthropic import Anthropic
+from app.services.llm_gateway import llm_gateway
 from typing import List, Dict
 
 class QueryClassifier:
@@ -24,13 +24,13 @@ Respond with ONLY one word:
 - "NONE" if the query is purely conversational or off-topic (e.g., "Hi!", "Tell me a joke", "How are you?")"""
 
     def __init__(self):
-        self.client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
         self.model = getattr(settings, 'CLASSIFIER_MODEL', settings.CLAUDE_MODEL)
 
     async def classify(
         self,
         question: str,
-        conversation_history: List[Dict] = None
+        conversation_history: List[Dict] = None,
+        user_id: str = None
     ) -> ContextNeed:
         """
         Classify query context necessity using LLM.
@@ -38,6 +38,7 @@ Respond with ONLY one word:
         Args:
             question: The user's query
             conversation_history: Previous messages (available if needed for future enhancements)
+            user_id: Caller, for fair scheduling in the LLM gateway
 
         Returns:
             ContextNeed enum indicating how much context to load
@@ -47,7 +48,8 @@ Respond with ONLY one word:
 
         try:
             # Call Claude Haiku for semantic classification
-            response = self.client.messages.create(
+            response = await llm_gateway.create(
+                user_id,
                 model=self.model,
                 max_tokens=10,  # Just need a single word response
                 messages=[
@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+
+
+class Reranker:
+    """
+    Optional second retrieval stage: re-scores dense candidates with a local
+    cross-encoder under a latency budget.
+
+    Scores are cached per (query, chunk). If scoring does not finish within
+    the budget the dense order is used; the scoring keeps running in the
+    background and fills the cache for the next identical request. At most
+    one scoring job runs at a time, on its own thread: while it is busy,
+    requests that would need new scores use the dense order straight away.
+    """
+
+    def __init__(self):
+        self.model_name = settings.RERANK_MODEL
+        self._model = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._running = None  # future of the scoring job in flight
+
+    @property
+    def model(self):
+        if not self._model:
+            from sentence_transformers import CrossEncoder
+            print(f"Loading Rerank Model: {self.model_name}")
+            # Cost grows with sequence length; the model's own limit (512) is
+            # far too slow to score a candidate set on CPU within the budget
+            self._model = CrossEncoder(self.model_name, max_length=settings.RERANK_MAX_LENGTH)
+        return self._model
+
+    def warm_up(self):
+        self.model.predict([("warm up", "warm up")])
+
+    @staticmethod
+    def _key(query: str, text: str):
+        return (query, hashlib.sha1(text.encode()).hexdigest())
+
+    def _cached(self, key):
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _score(self, query: str, texts: list[str]):
+        """Score (query, text) pairs in one batch and store them in the cache."""
+        scores = self.model.predict([(query, t) for t in texts], batch_size=32)
+        with self._lock:
+            for text, score in zip(texts, scores):
+                self._cache[self._key(query, text)] = float(score)
+            while len(self._cache) > settings.RERANK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    async def rerank(self, query: str, candidates: list[dict], top_k: int) -> list[dict]:
+        """
+        Reorder vector search results by cross-encoder relevance.
+
+        Args:
+            query: The user's query
+            candidates: Results from VectorService.search, in dense order
+            top_k: Number of results to keep
+
+        Returns:
+            The top_k candidates, reranked if scoring finished within budget
+        """
+        if len(candidates) <= 1:
+            return candidates[:top_k]
+
+        missing = [c["text"] for c in candidates if self._cached(self._key(query, c["text"])) is None]
+        if missing:
+            if self._running is not None and not self._running.done():
+                print("Reranker busy, using dense order")
+                return candidates[:top_k]
+            self._running = asyncio.get_running_loop().run_in_executor(self._executor, self._score, query, missing)
+            # Consume errors of jobs that outlive their request
+            self._running.add_done_callback(lambda f: f.cancelled() or f.exception())
+            try:
+                # shield: a timed-out job keeps running and keeps the slot until it finishes
+                await asyncio.wait_for(asyncio.shield(self._running), timeout=settings.RERANK_BUDGET_MS / 1000)
+            except asyncio.TimeoutError:
+                print(f"Rerank budget of {settings.RERANK_BUDGET_MS}ms exceeded, using dense order")
+                return candidates[:top_k]
+            except Exception as e:
+                print(f"Rerank error: {e}")
+                return candidates[:top_k]
+
+        scored = []
+        for c in candidates:
+            score = self._cached(self._key(query, c["text"]))
+            if score is None:
+                # Evicted between scoring and lookup; keep the dense order
+                return candidates[:top_k]
+            scored.append({**c, "rerank_score": score})
+        scored.sort(key=lambda c: c["rerank_score"], reverse=True)
+        return scored[:top_k]
+
+
+reranker = Reranker()
@@ -0,0 +1,93 @@
+import hashlib
+import zlib
+from datetime import datetime
+from bson import Binary
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import db
+
+
+class ResultStore:
+    """
+    Content-addressed store for Exa search results.
+
+    Each result is stored once in `search_results`, keyed by the SHA-256 of
+    its URL, with the text optionally zlib-compressed. Search sessions only
+    keep the list of keys (`result_refs`) and read bodies back in batches.
+
+    The store is shared by all users, so only results the server fetched
+    from Exa are written to it (the latest fetch of a URL wins). Anything a
+    client sends back is matched against it by URL, never stored.
+    """
+
+    def __init__(self):
+        self.collection = db.get_collection("search_results")
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _encode(self, result: dict) -> dict:
+        body = {k: v for k, v in result.items() if k not in ("_id", "text")}
+        text = result.get("text")
+        if text and settings.RESULT_STORE_COMPRESS and len(text) >= 1024:
+            body["text_z"] = Binary(zlib.compress(text.encode(), 6))
+        else:
+            body["text"] = text
+        return body
+
+    @staticmethod
+    def _decode(doc: dict) -> dict:
+        result = {k: v for k, v in doc.items() if k not in ("_id", "text_z", "created_at")}
+        if "text_z" in doc:
+            result["text"] = zlib.decompress(doc["text_z"]).decode()
+        return result
+
+    def _upsert_operation(self, result: dict) -> tuple[str, UpdateOne]:
+        """Key and bulk_write operation storing one result, replacing an older fetch."""
+        key = self.key(result["url"])
+        body = self._encode(result)
+        stale = "text" if "text_z" in body else "text_z"
+        return key, UpdateOne(
+            {"_id": key},
+            {"$set": body, "$unset": {stale: ""}, "$setOnInsert": {"created_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def put_many(self, results: list) -> list[str]:
+        """Store results fetched from Exa and return their keys in order."""
+        keys = []
+        operations = []
+        for result in results:
+            if not isinstance(result, dict) or not result.get("url"):
+                continue
+            key, operation = self._upsert_operation(result)
+            keys.append(key)
+            operations.append(operation)
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        return keys
+
+    async def refs_for(self, results: list) -> list[str]:
+        """Keys of the given results' URLs that are in the store, in order."""
+        keys = [self.key(r["url"]) for r in results if isinstance(r, dict) and r.get("url")]
+        if not keys:
+            return []
+        stored = {doc["_id"] async for doc in self.collection.find({"_id": {"$in": keys}}, {"_id": 1})}
+        return [k for k in dict.fromkeys(keys) if k in stored]
+
+    async def get_many(self, keys: list[str]) -> list[dict]:
+        """Fetch result bodies for keys in one query, preserving order."""
+        if not keys:
+            return []
+        found = {}
+        async for doc in self.collection.find({"_id": {"$in": keys}}):
+            found[doc["_id"]] = self._decode(doc)
+        return [found[k] for k in keys if k in found]
+
+    async def get_text(self, url: str) -> str | None:
+        doc = await self.collection.find_one({"_id": self.key(url)}, {"text": 1, "text_z": 1})
+        return self._decode(doc).get("text") if doc else None
+
+
+result_store = ResultStore()
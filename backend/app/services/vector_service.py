@@ -1,93 +1,681 @@
+import fcntl
+import hashlib
 import json
 import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from app.core.config import settings
 
 # Global Instance for Singelton Access
 _vector_store_instance = None
 
+# Model behind vectors written before records carried a model id
+LEGACY_MODEL = "all-MiniLM-L6-v2"
+
+# Embedding model held by process-pool workers (see encode_batch)
+_worker_model = None
+
+# Record fields used for pre-filtering, stored apart from the chunk text
+FILTER_FIELDS = ("tags", "is_favorite", "saved_at")
+
+# Manifest keys naming a generation's files
+GENERATION_FILES = ("records", "embeddings", "metadata", "texts", "offsets")
+
+
+def chunk_text(text: str, size: int = None, overlap: int = None) -> list[str]:
+    """Split text into overlapping character windows, breaking on whitespace."""
+    size = size or settings.CHUNK_SIZE
+    overlap = overlap if overlap is not None else settings.CHUNK_OVERLAP
+    text = text.strip()
+    if len(text) <= size:
+        return [text]
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            split = text.rfind(" ", start + size // 2, end)
+            if split != -1:
+                end = split
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [c for c in chunks if c]
+
+
+def content_hash(title: str, text: str) -> str:
+    """Hash of everything that determines a document's vectors apart from the model."""
+    key = f"{settings.CHUNK_SIZE}:{settings.CHUNK_OVERLAP}:{title}\n{text}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def saved_timestamp(value) -> float | None:
+    """Epoch seconds for a saved_at value (ISO string or datetime; naive means UTC)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def encode_batch(model_name: str, texts: list[str]):
+    """Embed texts in a worker process. Loads the model once per process."""
+    global _worker_model
+    if _worker_model is None:
+        from sentence_transformers import SentenceTransformer
+        _worker_model = SentenceTransformer(model_name)
+    return _worker_model.encode(texts, batch_size=64, convert_to_numpy=True)
+
+
+class ChunkTexts:
+    """
+    Chunk texts of one generation, memory-mapped from `texts-N.npy` (all
+    chunks' UTF-8 bytes back to back) and `offsets-N.npy` (row i spans
+    offsets[i]:offsets[i + 1]). Only the rows a search returns are decoded.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, index_dir: str, files: dict):
+        return cls(np.load(os.path.join(index_dir, files["texts"]), mmap_mode="r"),
+                   np.load(os.path.join(index_dir, files["offsets"]), mmap_mode="r"))
+
+    @staticmethod
+    def encode(texts: list[str]):
+        """(data, offsets) arrays to save for texts."""
+        encoded = [t.encode() for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode()
+
+
+class IndexGeneration:
+    """
+    One published state of the index: records (without their text, see
+    ChunkTexts), embeddings and the per-row arrays used for filtering. Never modified after construction (apart from
+    the lazily filled tag-mask cache); VectorService swaps in a new one with
+    a single assignment, so a reader holding a generation always sees rows
+    and vectors that belong together.
+    """
+
+    def __init__(self, number: int, records: list, embeddings, files: dict = None, texts: ChunkTexts = None):
+        self.number = number
+        self.records = records
+        self.embeddings = embeddings
+        self.files = files or {}  # records / embeddings / metadata / texts / offsets file names
+        self.texts = texts  # None for generations that kept the text in the records
+        self.user_ids = np.array([r["user_id"] for r in records], dtype=object)
+        self.models = np.array([r.get("model", LEGACY_MODEL) for r in records], dtype=object)
+        self.favorites = np.array([bool(r.get("is_favorite")) for r in records], dtype=bool)
+        saved_at = [r.get("saved_at") for r in records]
+        self.saved_at = np.array([np.nan if t is None else t for t in saved_at], dtype=np.float64)
+        self._tag_masks = {}  # built on first use per tag
+
+    @classmethod
+    def empty(cls):
+        return cls(-1, [], np.zeros((0, 0), dtype=np.float32))
+
+    def text(self, i: int) -> str:
+        return self.texts[i] if self.texts is not None else self.records[i].get("text", "")
+
+    def full_record(self, i: int) -> dict:
+        """Row i with its chunk text, as writers pass records to _publish."""
+        return {**self.records[i], "text": self.text(i)}
+
+    def indexed_hashes(self) -> dict:
+        return {r["id"]: (r.get("model", LEGACY_MODEL), r.get("content_hash")) for r in self.records}
+
+    def tag_mask(self, tag: str):
+        mask = self._tag_masks.get(tag)
+        if mask is None:
+            mask = np.array([tag in (r.get("tags") or ()) for r in self.records], dtype=bool)
+            self._tag_masks[tag] = mask
+        return mask
+
+    def filter_mask(self, user_id: str, model_name: str, filters=None):
+        """Boolean mask of rows the query may match, applied before scoring."""
+        # Only vectors from the current model are comparable with the query
+        mask = (self.user_ids == user_id) & (self.models == model_name)
+        if filters is None:
+            return mask
+        if filters.tags:
+            tag_mask = np.zeros(len(self.records), dtype=bool)
+            for tag in filters.tags:
+                tag_mask |= self.tag_mask(tag)
+            mask &= tag_mask
+        if filters.favorites_only:
+            mask &= self.favorites
+        # Papers without a saved date (NaN) match neither bound
+        if filters.saved_after:
+            mask &= self.saved_at >= saved_timestamp(filters.saved_after)
+        if filters.saved_before:
+            mask &= self.saved_at < saved_timestamp(filters.saved_before)
+        return mask
+
+
 class VectorService:
+    """
+    File-backed vector index shared by every uvicorn worker.
+
+    The index directory holds immutable generations (`records-N.json`,
+    `embeddings-N.npy`, the chunk text in `texts-N.npy`/`offsets-N.npy` and
+    the filter fields in `meta-N.json`) and a `manifest.json` pointing at
+    the current one. A metadata-only change (tags, favorite) writes just a
+    new `meta-N.json`, and workers refreshing to it reuse the records they
+    already hold. Embeddings and texts are memory-mapped read-only, so all
+    workers share the same pages. Writes take an exclusive file lock, re-read the latest generation,
+    publish a new one and atomically swap the manifest. Readers pick up the
+    new generation on their next search.
+
+    The current state is one IndexGeneration. Readers take it once
+    (`snapshot()`) and use only that object, so a writer publishing from
+    another thread can never mix rows of two generations into one result.
+
+    Nothing is read from disk until first use (or the startup warm-up), and
+    sentence_transformers/torch are only imported when the model is needed.
+    """
+
     def __init__(self):
-        self.filename = "vectors.json"
-        self.model_name = "all-MiniLM-L6-v2"
-        self.data = []
+        self.index_dir = settings.VECTOR_INDEX_DIR
+        self.legacy_filename = "vectors.json"
+        self.model_name = settings.EMBEDDING_MODEL
+        self._current = IndexGeneration.empty()
+        self._thread_lock = threading.RLock()
+        self._install_lock = threading.Lock()  # guards replacing _current
+        self._lock_depth = 0
+        self._manifest_mtime = None
         self._model = None
-        self.load()
+        self.loaded = False
 
     @property
     def model(self):
         if not self._model:
+            from sentence_transformers import SentenceTransformer
             print(f"Loading Embedding Model: {self.model_name}")
             self._model = SentenceTransformer(self.model_name)
         return self._model
 
+    @property
+    def model_loaded(self) -> bool:
+        return self._model is not None
+
+    def warm_up(self):
+        """Load the model and run one encode so the first query pays no setup cost."""
+        self.model.encode("warm up")
+
+    @property
+    def records(self):
+        return self._current.records
+
+    @property
+    def embeddings(self):
+        return self._current.embeddings
+
+    @property
+    def generation(self) -> int:
+        return self._current.number
+
+    def snapshot(self) -> IndexGeneration:
+        """Refresh, then return the current generation for consistent reads."""
+        self.refresh()
+        return self._current
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.index_dir, "manifest.json")
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive, cross-process lock making the holder the single writer. Reentrant."""
+        with self._thread_lock:
+            if self._lock_depth:
+                # e.g. a write that triggers the first load, which imports vectors.json
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(os.path.join(self.index_dir, ".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
     def load(self):
-        if os.path.exists(self.filename):
+        manifest = self._read_manifest()
+        if manifest is None:
+            if not os.path.exists(self.legacy_filename):
+                # Nothing to load yet; the first write creates the index
+                self.loaded = True
+                return
+            # First start after upgrading: convert vectors.json into generation 0
+            with self._write_lock():
+                if self._read_manifest() is None:
+                    self._import_legacy()
+            manifest = self._read_manifest()
+            if manifest is None:
+                return  # import failed; stay unloaded so writes are refused
+
+        try:
+            self._install(self._load_generation(manifest))
+            self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+            self.loaded = True
+            print(f"Service Loaded {len(self.records)} vectors (generation {self.generation})")
+        except Exception as e:
+            print(f"Error loading vectors: {e}")
+
+    def _load_generation(self, manifest) -> IndexGeneration:
+        generation = manifest["generation"]
+        files = {k: manifest[k] for k in GENERATION_FILES if k in manifest}
+        base = self._current
+        if "metadata" in manifest and base.files.get("records") == manifest["records"]:
+            # Metadata-only generation: same rows, so keep the records,
+            # vectors and texts already loaded and only merge the new fields
+            with open(os.path.join(self.index_dir, manifest["metadata"]), "r") as f:
+                metadata = json.load(f)
+            records = [{**r, **fields} for r, fields in zip(base.records, metadata)]
+            return IndexGeneration(generation, records, base.embeddings, files, base.texts)
+
+        with open(os.path.join(self.index_dir, manifest["records"]), "r") as f:
+            records = json.load(f)
+        if "metadata" in manifest:
+            with open(os.path.join(self.index_dir, manifest["metadata"]), "r") as f:
+                metadata = json.load(f)
+            for record, fields in zip(records, metadata):
+                record.update(fields)
+        else:
+            # Generations written before meta-N.json kept the fields inline
+            for record in records:
+                record.update(self._filter_metadata(record))
+        texts = None
+        if records:
+            embeddings = np.load(os.path.join(self.index_dir, manifest["embeddings"]), mmap_mode="r")
+            if "texts" in manifest:
+                texts = ChunkTexts.load(self.index_dir, files)
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        return IndexGeneration(generation, records, embeddings, files, texts)
+
+    def _install(self, generation: IndexGeneration):
+        """
+        Make generation current unless a newer one already is: a reader that
+        loaded an older manifest must not roll back a writer's publish.
+        """
+        with self._install_lock:
+            if generation.number > self._current.number:
+                self._current = generation
+
+    def _writable_snapshot(self) -> IndexGeneration:
+        """
+        The generation a writer (holding the lock) builds on.
+
+        Raises unless it is the one in the manifest and came from a
+        successful load: publishing on top of an empty or stale view would
+        replace every user's vectors with just this write's.
+        """
+        current = self.snapshot()
+        manifest = self._read_manifest()
+        if not self.loaded or (manifest is not None and manifest["generation"] != current.number):
+            raise RuntimeError(
+                f"Vector index not loaded at the latest generation "
+                f"({current.number}, manifest {manifest and manifest['generation']}); refusing to write"
+            )
+        return current
+
+    def refresh(self):
+        """Switch to the latest published generation if another worker wrote one."""
+        if not self.loaded:
+            self.load()
+            return
+        for _ in range(3):
+            try:
+                mtime = os.stat(self.manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime == self._manifest_mtime:
+                return
+            manifest = self._read_manifest()
             try:
-                with open(self.filename, 'r') as f:
-                    self.data = json.load(f)
-                print(f"Service Loaded {len(self.data)} vectors")
+                if manifest and manifest["generation"] > self.generation:
+                    self._install(self._load_generation(manifest))
+                self._manifest_mtime = mtime
+                return
+            except FileNotFoundError:
+                # Two newer writes landed after we read the manifest and the
+                # second one removed its files; the manifest points further on now
+                continue
             except Exception as e:
-                print(f"Error loading vectors: {e}")
-                self.data = []
+                # Keep serving the loaded generation; writers refuse until a load succeeds
+                print(f"Error loading generation {manifest.get('generation')}: {e}")
+                return
+        print(f"Index changing too fast to refresh; staying on generation {self.generation}")
+
+    def _import_legacy(self):
+        try:
+            with open(self.legacy_filename, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error loading vectors: {e}")
+            return
+        # The content hash of vectors.json entries is unknown, so the
+        # re-index script will re-embed these documents
+        records = [
+            {**{k: d[k] for k in ("id", "user_id", "title", "text")},
+             "chunk": 0, "model": LEGACY_MODEL, "dim": len(d["embedding"]), "content_hash": None}
+            for d in data
+        ]
+        embeddings = np.array([d["embedding"] for d in data], dtype=np.float32)
+        self._publish(IndexGeneration.empty(), records, self._normalize(embeddings))
+        print(f"Imported {len(records)} vectors from {self.legacy_filename}")
+
+    def _publish(self, snapshot: IndexGeneration, records, embeddings, metadata_only=False):
+        """
+        Write the generation after `snapshot` (what the caller read under the
+        lock) and swap the manifest. Caller holds the lock.
+
+        Records carry their chunk text, which is written to the texts file.
+        With metadata_only (filter fields changed, same rows in the same
+        order) the new generation writes only its meta file and points at
+        the snapshot's other files; records need no text then.
+        """
+        generation = snapshot.number + 1
+        latest = self._read_manifest()
+        if latest is not None and generation <= latest["generation"]:
+            raise RuntimeError(f"Generation {generation} is not newer than published {latest['generation']}")
+        previous = snapshot.files
+        files = {"metadata": f"meta-{generation}.json"}
+
+        metadata = [{k: r.get(k) for k in FILTER_FIELDS} for r in records]
+        self._atomic_write(files["metadata"], lambda f: f.write(json.dumps(metadata).encode()))
+        if metadata_only and "records" in previous:
+            files.update({k: v for k, v in previous.items() if k != "metadata"})
+            texts = snapshot.texts
+        else:
+            files.update({
+                "records": f"records-{generation}.json",
+                "embeddings": f"embeddings-{generation}.npy",
+                "texts": f"texts-{generation}.npy",
+                "offsets": f"offsets-{generation}.npy"
+            })
+            data, offsets = ChunkTexts.encode([r.get("text") or "" for r in records])
+            records = [{k: v for k, v in r.items() if k != "text"} for r in records]
+            chunks = [{k: v for k, v in r.items() if k not in FILTER_FIELDS} for r in records]
+            self._atomic_write(files["records"], lambda f: f.write(json.dumps(chunks).encode()))
+            self._atomic_write(files["embeddings"], lambda f: np.save(f, embeddings))
+            self._atomic_write(files["texts"], lambda f: np.save(f, data))
+            self._atomic_write(files["offsets"], lambda f: np.save(f, offsets))
+            texts = ChunkTexts.load(self.index_dir, files)
+        manifest = {"generation": generation, **files}
+        self._atomic_write("manifest.json", lambda f: f.write(json.dumps(manifest).encode()))
+
+        # Keep the previous generation around for readers that still map it
+        in_use = set(files.values()) | set(previous.values())
+        for name in os.listdir(self.index_dir):
+            stem, _, ext = name.rpartition(".")
+            prefix, _, gen = stem.rpartition("-")
+            if (prefix in ("records", "embeddings", "meta", "texts", "offsets") and gen.isdigit()
+                    and int(gen) < generation - 1 and name not in in_use):
+                os.remove(os.path.join(self.index_dir, name))
+
+        self._install(IndexGeneration(generation, records, embeddings, files, texts))
+        self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+
+    def _atomic_write(self, name, write):
+        path = os.path.join(self.index_dir, name)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _normalize(embeddings):
+        if embeddings.size == 0:
+            return embeddings
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / (norms + 1e-9)).astype(np.float32)
 
-    def save(self):
-        with open(self.filename, 'w') as f:
-            json.dump(self.data, f)
+    def swap(self, merge):
+        """
+        Atomically replace the whole index.
+
+        merge(records, embeddings) receives the latest generation (records
+        with their text) under the write lock and returns the (records,
+        embeddings) to publish.
+        """
+        with self._write_lock():
+            current = self._writable_snapshot()
+            full = [current.full_record(i) for i in range(len(current.records))]
+            records, embeddings = merge(full, current.embeddings)
+            self._publish(current, records, np.asarray(embeddings, dtype=np.float32))
+
+    def indexed_hashes(self) -> dict:
+        """Map of doc id -> (model, content_hash) in the current generation."""
+        return self.snapshot().indexed_hashes()
 
     def get_embedding(self, text: str):
         return self.model.encode(text).tolist()
 
-    def upsert(self, doc_id: str, user_id: str, title: str, text: str):
-        # Remove existing
-        self.data = [d for d in self.data if not (d['id'] == doc_id)]
-        
-        combined_text = f"{title}: {text}"
-        embedding = self.get_embedding(combined_text)
-        
-        self.data.append({
-            "id": doc_id,
-            "user_id": user_id,
-            "title": title,
-            "text": text,
-            "embedding": embedding
-        })
-        self.save()
-        print(f"Upserted {doc_id}")
+    @staticmethod
+    def chunk_inputs(title: str, text: str) -> tuple[list[str], list[str]]:
+        """Return (chunks, texts to embed) for a document."""
+        chunks = chunk_text(text)
+        return chunks, [f"{title}: {c}" for c in chunks]
+
+    def upsert_many(self, items: list[dict]):
+        """
+        Replace the chunks of several documents in a single generation.
+
+        Each item holds id, user_id, title, chunks, their precomputed
+        embeddings (from self.model_name), the document's content_hash and
+        its filterable metadata. Re-running an item is idempotent.
+        """
+        if not items:
+            return
+        doc_ids = {item["id"] for item in items}
+        new_embeddings = self._normalize(np.vstack([
+            np.asarray(item["embeddings"], dtype=np.float32) for item in items
+        ]))
+        dim = new_embeddings.shape[1]
+        new_records = []
+        for item in items:
+            metadata = self._filter_metadata(item.get("metadata", {}))
+            for i, chunk in enumerate(item["chunks"]):
+                new_records.append({
+                    "id": item["id"],
+                    "chunk": i,
+                    "user_id": item["user_id"],
+                    "title": item["title"],
+                    "text": chunk,
+                    "model": self.model_name,
+                    "dim": dim,
+                    "content_hash": item.get("content_hash"),
+                    **metadata
+                })
+
+        with self._write_lock():
+            current = self._writable_snapshot()
+            keep = [i for i, d in enumerate(current.records) if d['id'] not in doc_ids]
+            if keep and current.embeddings.shape[1] != dim:
+                # Never drop another model's vectors to make room: until
+                # scripts/reindex_vectors.py swaps in a rebuilt index they are
+                # the only ones the other workers (or the old app) can search
+                models = ", ".join(sorted(set(current.models[keep])))
+                message = (f"Index holds {current.embeddings.shape[1]}-dimensional vectors from {models}; "
+                           f"not adding {dim}-dimensional vectors from {self.model_name}. "
+                           f"Finish scripts/reindex_vectors.py and restart with the same EMBEDDING_MODEL")
+                print(message)
+                raise ValueError(message)
+            records = [current.full_record(i) for i in keep] + new_records
+            if keep:
+                embeddings = np.vstack([current.embeddings[keep], new_embeddings])
+            else:
+                embeddings = new_embeddings
+            self._publish(current, records, embeddings)
+        print(f"Upserted {len(doc_ids)} documents ({len(new_records)} chunks)")
+
+    @staticmethod
+    def _filter_metadata(metadata: dict) -> dict:
+        """The SavedResult fields mirrored into the index for pre-filtering."""
+        return {
+            "tags": list(metadata.get("tags") or []),
+            "is_favorite": bool(metadata.get("is_favorite")),
+            "saved_at": saved_timestamp(metadata.get("saved_at"))
+        }
+
+    def update_metadata(self, doc_id: str, user_id: str, metadata: dict):
+        """Sync changed filter fields of a document without re-embedding it."""
+        with self._write_lock():
+            current = self._writable_snapshot()
+            changed = False
+            records = []
+            for r in current.records:
+                if r["id"] == doc_id and r["user_id"] == user_id:
+                    fields = self._filter_metadata({**r, **metadata})
+                    if any(r.get(k) != v for k, v in fields.items()):
+                        r = {**r, **fields}
+                        changed = True
+                records.append(r)
+            if changed:
+                self._publish(current, records, current.embeddings, metadata_only=True)
+
+    def document_centroids(self, user_id: str) -> tuple[list[str], np.ndarray]:
+        """Unit-length mean chunk embedding of each of a user's indexed documents."""
+        current = self.snapshot()
+        rows = np.flatnonzero(current.filter_mask(user_id, self.model_name))
+        if rows.size == 0:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        doc_ids, inverse = np.unique([current.records[i]["id"] for i in rows], return_inverse=True)
+        sums = np.zeros((len(doc_ids), current.embeddings.shape[1]), dtype=np.float32)
+        np.add.at(sums, inverse, current.embeddings[rows])
+        return doc_ids.tolist(), self._normalize(sums)
+
+    def find_near_duplicate(self, user_id: str, embeddings, threshold: float, exclude_id: str = None):
+        """
+        Id of the user's indexed document whose centroid is at least `threshold`
+        cosine-similar to the centroid of `embeddings`, or None.
+        """
+        doc_ids, centroids = self.document_centroids(user_id)
+        if not doc_ids:
+            return None
+        query = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        query = self._normalize(query.mean(axis=0, keepdims=True))[0]
+        similarities = centroids @ query
+        if exclude_id in doc_ids:
+            similarities[doc_ids.index(exclude_id)] = -1.0
+        best = int(np.argmax(similarities))
+        return doc_ids[best] if similarities[best] >= threshold else None
 
     def delete(self, doc_id: str, user_id: str):
-        initial_len = len(self.data)
-        self.data = [d for d in self.data if not (d['id'] == doc_id and d['user_id'] == user_id)]
-        if len(self.data) < initial_len:
-            self.save()
+        with self._write_lock():
+            current = self._writable_snapshot()
+            keep = [i for i, d in enumerate(current.records) if not (d['id'] == doc_id and d['user_id'] == user_id)]
+            if len(keep) == len(current.records):
+                return
+            records = [current.full_record(i) for i in keep]
+            embeddings = np.array(current.embeddings[keep], dtype=np.float32) if keep else np.zeros((0, 0), dtype=np.float32)
+            self._publish(current, records, embeddings)
 
-    def search(self, query: str, user_id: str, n_results: int = 5):
-        if not self.data:
+    def search(self, query: str, user_id: str, n_results: int = 5, filters=None):
+        """
+        Top documents for a query by cosine similarity.
+
+        filters (RetrievalFilters) restricts the candidate rows before any
+        similarity is computed, so the top-k is never wasted on excluded papers.
+        """
+        current = self.snapshot()
+        if not current.records:
             return []
-            
-        user_data = [d for d in self.data if d.get('user_id') == user_id]
-        if not user_data:
+
+        user_indices = np.flatnonzero(current.filter_mask(user_id, self.model_name, filters))
+        if user_indices.size == 0:
             return []
 
-        query_vec = np.array(self.get_embedding(query))
-        embeddings = np.array([d['embedding'] for d in user_data])
-        
-        # Cosine Similarity
-        norm_data = np.linalg.norm(embeddings, axis=1)
-        norm_query = np.linalg.norm(query_vec)
-        denominators = norm_data * norm_query
-        similarities = np.dot(embeddings, query_vec) / (denominators + 1e-9)
-        
-        k = min(n_results, len(user_data))
-        top_indices = np.argsort(similarities)[::-1][:k]
-        
+        query_vec = self._normalize(np.array([self.get_embedding(query)], dtype=np.float32))[0]
+
+        # Cosine Similarity (stored embeddings are unit length)
+        similarities = current.embeddings[user_indices] @ query_vec
+        return self._top_documents(current, user_indices, similarities, n_results)
+
+    def search_many(self, queries: list[str], user_id: str, n_results: int = 5, filters=None, depth: int = 50):
+        """
+        Top documents for several phrasings of one question, fused by
+        reciprocal rank (score = sum of 1 / (MULTI_QUERY_RRF_K + rank)).
+
+        All queries are embedded in one batch and scored with a single
+        matrix product, so this costs about as much as one search. Each
+        query contributes its best `depth` documents to the fusion; the
+        chunk returned per document is its best match over all queries.
+        """
+        current = self.snapshot()
+        if not current.records or not queries:
+            return []
+
+        user_indices = np.flatnonzero(current.filter_mask(user_id, self.model_name, filters))
+        if user_indices.size == 0:
+            return []
+
+        query_vecs = self._normalize(np.asarray(self.model.encode(queries, convert_to_numpy=True), dtype=np.float32))
+        similarities = current.embeddings[user_indices] @ query_vecs.T  # (chunks, queries)
+
+        fused = {}
+        best = {}
+        for q in range(similarities.shape[1]):
+            for rank, res in enumerate(self._top_documents(current, user_indices, similarities[:, q], depth), start=1):
+                fused[res["id"]] = fused.get(res["id"], 0.0) + 1.0 / (settings.MULTI_QUERY_RRF_K + rank)
+                if res["id"] not in best or res["score"] > best[res["id"]]["score"]:
+                    best[res["id"]] = res
+
+        ranked = sorted(fused, key=fused.get, reverse=True)[:n_results]
+        return [{**best[doc_id], "score": fused[doc_id]} for doc_id in ranked]
+
+    @staticmethod
+    def _top_documents(current: IndexGeneration, user_indices, similarities, n_results: int):
+        """Best-scoring chunk per document, up to n_results documents."""
         results = []
-        for idx in top_indices:
-            res = user_data[idx]
+        seen = set()
+        for idx in np.argsort(similarities)[::-1]:
+            if len(results) == n_results:
+                break
+            row = user_indices[idx]
+            res = current.records[row]
+            if res["id"] in seen:
+                continue
+            seen.add(res["id"])
             results.append({
                 "id": res["id"],
-                "text": res["text"],
+                "text": current.text(row),
                 "metadata": {"title": res["title"]},
                 "score": float(similarities[idx])
             })
@@ -97,4 +685,4 @@ def get_vector_service():
     global _vector_store_instance
     if _vector_store_instance is None:
         _vector_store_instance = VectorService()
-    return _vector_store_instance
\ No newline at end of file
+    return _vector_store_instance
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from app.core.config import settings
+from app.services.vector_service import get_vector_service
+from app.services.reranker import reranker
+
+
+class WarmupService:
+    """
+    Loads the vector index (and optionally the models) in the background so
+    the app starts serving immediately, and reports readiness for /ready.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.timings = {}
+        self.error = None
+        self._task = None
+
+    def start(self, import_seconds: float = None):
+        if import_seconds is not None:
+            self.timings["import_seconds"] = round(import_seconds, 3)
+        self.started_at = time.perf_counter()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _timed(self, name: str, fn):
+        t0 = time.perf_counter()
+        await asyncio.to_thread(fn)
+        self.timings[name] = round(time.perf_counter() - t0, 3)
+
+    async def _run(self):
+        vector_service = get_vector_service()
+        try:
+            await self._timed("index_load_seconds", vector_service.refresh)
+            if not vector_service.loaded:
+                # Stays not ready; the next search retries the load
+                self.error = "Vector index failed to load"
+            if settings.EAGER_WARMUP:
+                await self._timed("model_warmup_seconds", vector_service.warm_up)
+                if settings.RERANK_ENABLED:
+                    await self._timed("rerank_warmup_seconds", reranker.warm_up)
+            self.timings["ready_seconds"] = round(time.perf_counter() - self.started_at, 3)
+            print(f"Startup complete: {self.timings}")
+        except Exception as e:
+            self.error = str(e)
+            print(f"Warm-up error: {e}")
+
+    def status(self) -> dict:
+        vector_service = get_vector_service()
+        index_loaded = vector_service.loaded
+        model_loaded = vector_service.model_loaded
+        ready = index_loaded and (model_loaded or not settings.EAGER_WARMUP)
+        return {
+            "ready": ready,
+            "index_loaded": index_loaded,
+            "model_loaded": model_loaded,
+            "vectors": len(vector_service.records),
+            "generation": vector_service.generation,
+            "timings": self.timings,
+            "error": self.error
+        }
+
+
+warmup_service = WarmupService()
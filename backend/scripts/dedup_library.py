@@ -0,0 +1,135 @@
+"""
+Find and link near-duplicate papers in existing libraries.
+
+For every user, papers are visited oldest first. A paper is linked to an
+earlier one (duplicate_of) when their MinHash Jaccard estimate reaches
+DEDUP_JACCARD_THRESHOLD or, for papers already in the vector index, when
+their embedding centroids reach DEDUP_EMBEDDING_THRESHOLD. Linked papers
+are removed from the vector index in one swap at the end, together with
+any linked paper a previous interrupted run left in it. Missing MinHash
+signatures are computed and stored along the way.
+
+Usage:
+    python scripts/dedup_library.py [--user USERNAME] [--dry-run]
+
+Run from the backend directory.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.dedup_service import DedupService
+from app.services.vector_service import VectorService
+
+DATABASE_NAME = "research_db"
+
+
+async def dedup_user(collection, versions, vector_service, dedup, user_id: str, dry_run: bool) -> int:
+    doc_ids, centroids = vector_service.document_centroids(user_id)
+    centroid_of = {doc_id: centroids[i] for i, doc_id in enumerate(doc_ids)}
+
+    canonical = []                 # (doc_id, minhash) of papers kept so far
+    band_index = defaultdict(list)  # lsh band -> positions in canonical
+    linked = 0
+
+    cursor = collection.find(
+        {"user_id": user_id, "duplicate_of": {"$exists": False}},
+        {"title": 1, "text": 1, "minhash": 1, "lsh_bands": 1}
+    ).sort("_id", 1)
+    async for doc in cursor:
+        doc_id = str(doc["_id"])
+        if not doc.get("text"):
+            continue
+        if "minhash" not in doc:
+            doc.update(dedup.fields(doc["text"]))
+            if not dry_run:
+                await collection.update_one(
+                    {"_id": doc["_id"]},
+                    {"$set": {"minhash": doc["minhash"], "lsh_bands": doc["lsh_bands"]}}
+                )
+
+        duplicate_of = None
+        candidates = {pos for band in doc["lsh_bands"] for pos in band_index[band]}
+        best = settings.DEDUP_JACCARD_THRESHOLD
+        for pos in candidates:
+            score = dedup.similarity(doc["minhash"], canonical[pos][1])
+            if score >= best:
+                duplicate_of, best = canonical[pos][0], score
+
+        if duplicate_of is None and doc_id in centroid_of:
+            best = settings.DEDUP_EMBEDDING_THRESHOLD
+            for other_id, _ in canonical:
+                if other_id in centroid_of:
+                    score = float(np.dot(centroid_of[doc_id], centroid_of[other_id]))
+                    if score >= best:
+                        duplicate_of, best = other_id, score
+
+        if duplicate_of:
+            linked += 1
+            print(f"  {doc.get('title', doc_id)[:60]} -> duplicate of {duplicate_of}")
+            if not dry_run:
+                await collection.update_one({"_id": doc["_id"]}, {"$set": {"duplicate_of": duplicate_of}})
+            continue
+
+        for band in doc["lsh_bands"]:
+            band_index[band].append(len(canonical))
+        canonical.append((doc_id, doc["minhash"]))
+
+    if linked and not dry_run:
+        await versions.update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+    return linked
+
+
+async def main(user: str | None, dry_run: bool):
+    print(f"Connecting to MongoDB: {settings.MONGO_DETAILS}")
+    client = AsyncIOMotorClient(settings.MONGO_DETAILS)
+    db = client[DATABASE_NAME]
+    collection = db["saved_research"]
+    vector_service = VectorService()
+    dedup = DedupService()
+
+    users = [user] if user else await collection.distinct("user_id")
+    total = 0
+    for user_id in users:
+        print(f"\n--- {user_id} ---")
+        total += await dedup_user(collection, db["library_versions"], vector_service, dedup, user_id, dry_run)
+
+    if not dry_run:
+        # Every linked paper of these users, so a rerun also cleans up after an interrupted one
+        linked = set()
+        async for doc in collection.find({"user_id": {"$in": users}, "duplicate_of": {"$exists": True}}, {"user_id": 1}):
+            linked.add((str(doc["_id"]), doc["user_id"]))
+
+        removed = 0
+
+        def without_linked(records, embeddings):
+            nonlocal removed
+            keep = [i for i, r in enumerate(records) if (r["id"], r["user_id"]) not in linked]
+            removed = len(records) - len(keep)
+            if not keep:
+                return [], np.zeros((0, 0), dtype=np.float32)
+            return [records[i] for i in keep], embeddings[keep]
+
+        if any((r["id"], r["user_id"]) in linked for r in vector_service.snapshot().records):
+            vector_service.swap(without_linked)
+        print(f"\nRemoved {removed} vectors of linked papers from the index")
+
+    print(f"\n{'Would link' if dry_run else 'Linked'} {total} near-duplicate papers")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", help="only this user's library")
+    parser.add_argument("--dry-run", action="store_true", help="report duplicates without changing anything")
+    args = parser.parse_args()
+    asyncio.run(main(args.user, args.dry_run))
@@ -0,0 +1,77 @@
+"""
+Local stand-in for the Anthropic Messages API, for exercising the LLM
+gateway (queueing, rate limits, retries, circuit breaker) without real calls.
+
+Returns a canned reply after --latency seconds. A --fail-rate fraction of
+requests is answered with 429 (with retry-after) or 529 instead.
+
+Usage:
+    python scripts/fake_anthropic.py [--port 8089] [--latency 0.5] [--fail-rate 0.2]
+
+Then start the backend with ANTHROPIC_BASE_URL=http://localhost:8089 and watch
+GET /metrics while sending chat queries.
+"""
+
+import argparse
+import asyncio
+import random
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake Anthropic")
+config = {"latency": 0.5, "fail_rate": 0.0}
+stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "failed": 0}
+
+
+@app.post("/v1/messages")
+async def create_message(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(config["latency"])
+        if random.random() < config["fail_rate"]:
+            stats["failed"] += 1
+            if random.random() < 0.5:
+                return JSONResponse(
+                    {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limited"}},
+                    status_code=429,
+                    headers={"retry-after": "1"}
+                )
+            return JSONResponse(
+                {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+                status_code=529
+            )
+
+        text = "HIGH" if body.get("max_tokens", 0) <= 10 else "This is a canned answer from the fake Anthropic server."
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": len(str(body)) // 4, "output_tokens": len(text) // 4}
+        }
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 429/529")
+    args = parser.parse_args()
+    config.update(latency=args.latency, fail_rate=args.fail_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
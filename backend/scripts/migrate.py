@@ -0,0 +1,189 @@
+"""
+Apply pending schema migrations (scripts/migrations) to MongoDB.
+
+Each migration walks its collection in _id order, BATCH_SIZE documents at
+a time, and writes the resulting operations with bulk_write. Progress is
+checkpointed in the schema_migrations collection after every batch, so an
+interrupted run resumes where it stopped. A migration that fails its
+verification is rescanned from the start on the next run (it only selects
+documents that still need it); --restart VERSION forgets a migration's
+checkpoint explicitly. The highest fully applied version is the database's
+schema version.
+
+Writes are throttled to --ops-per-sec to keep load off a live database.
+--dry-run reads and builds every operation but writes nothing (not even
+checkpoints). To rehearse the real writes, point --mongo at a local copy,
+e.g. a mongodump restored into the docker-compose mongo container.
+
+Usage:
+    python scripts/migrate.py [--status] [--to VERSION] [--restart VERSION]
+                              [--batch-size 500] [--ops-per-sec 1000]
+                              [--dry-run] [--mongo URL]
+
+Run from the backend directory.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from migrations import MIGRATIONS
+
+DATABASE_NAME = "research_db"
+
+
+class Throttle:
+    """Sleeps as needed to keep the average write rate at or below ops_per_sec."""
+
+    def __init__(self, ops_per_sec: float):
+        self.ops_per_sec = ops_per_sec
+        self.started = time.monotonic()
+        self.ops = 0
+
+    async def wait(self, ops: int):
+        self.ops += ops
+        if self.ops_per_sec <= 0:
+            return
+        ahead = self.ops / self.ops_per_sec - (time.monotonic() - self.started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+
+async def schema_version(versions) -> int:
+    """Highest version applied without gaps."""
+    done = {doc["_id"] async for doc in versions.find({"status": "done"}, {"_id": 1})}
+    version = 0
+    while version + 1 in done:
+        version += 1
+    return version
+
+
+async def run_migration(db, versions, migration, batch_size: int, throttle: Throttle, dry_run: bool) -> bool:
+    state = await versions.find_one({"_id": migration.version}) or {}
+    last_id = state.get("last_id")
+    scanned = state.get("scanned", 0)
+    written = state.get("written", 0)
+
+    label = f"{migration.version:03d} {migration.name}"
+    print(f"\n--- {label} ({'resuming' if last_id else 'starting'}{', dry run' if dry_run else ''}) ---")
+    if not dry_run:
+        await versions.update_one(
+            {"_id": migration.version},
+            {
+                "$set": {"name": migration.name, "status": "running", "updated_at": datetime.utcnow()},
+                "$setOnInsert": {"started_at": datetime.utcnow()},
+                "$unset": {"error": ""}
+            },
+            upsert=True
+        )
+
+    collection = db[migration.collection]
+    try:
+        while True:
+            query = dict(migration.query)
+            if last_id is not None:
+                query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+            batch = await collection.find(query, migration.projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+
+            operations = [op for doc in batch for op in migration.operations(doc)]
+            batch_ops = len(operations)
+
+            if operations and not dry_run:
+                await collection.bulk_write(operations, ordered=False)
+
+            last_id = batch[-1]["_id"]
+            scanned += len(batch)
+            written += batch_ops
+
+            if not dry_run:
+                await versions.update_one(
+                    {"_id": migration.version},
+                    {"$set": {"last_id": last_id, "scanned": scanned, "written": written, "updated_at": datetime.utcnow()}}
+                )
+            print(f"  {scanned} documents, {written} write operations{' (not written)' if dry_run else ''}")
+            await throttle.wait(batch_ops)
+    except Exception as e:
+        print(f"  FAILED after {scanned} documents: {e}")
+        if not dry_run:
+            await versions.update_one({"_id": migration.version}, {"$set": {"status": "failed", "error": str(e)}})
+        return False
+
+    if dry_run:
+        return True
+
+    ok = await migration.verify(db)
+    if ok:
+        update = {"$set": {"status": "done", "finished_at": datetime.utcnow()}}
+    else:
+        # The checkpoint is past every document; rescan from the start next time
+        update = {"$set": {"status": "failed", "error": "verification failed"}, "$unset": {"last_id": ""}}
+    await versions.update_one({"_id": migration.version}, update)
+    print(f"  {'Done' if ok else 'FAILED verification; the next run starts over'}")
+    return ok
+
+
+async def main(args):
+    mongo_url = args.mongo or settings.MONGO_DETAILS
+    print(f"Connecting to MongoDB: {mongo_url}")
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[DATABASE_NAME]
+    versions = db["schema_migrations"]
+
+    migrations = [cls() for cls in MIGRATIONS]
+    numbers = [m.version for m in migrations]
+    assert numbers == sorted(set(numbers)), "migration versions must be unique and increasing"
+
+    if args.restart is not None and not args.dry_run:
+        await versions.delete_one({"_id": args.restart})
+        print(f"Reset migration {args.restart:03d}")
+
+    current = await schema_version(versions)
+    print(f"Schema version: {current}")
+
+    if args.status:
+        async for doc in versions.find().sort("_id", 1):
+            print(f"  {doc['_id']:03d} {doc.get('name')}: {doc.get('status')} ({doc.get('scanned', 0)} documents)")
+        client.close()
+        return True
+
+    target = args.to if args.to is not None else numbers[-1] if numbers else 0
+    pending = [m for m in migrations if current < m.version <= target]
+    if not pending:
+        print("Nothing to migrate.")
+
+    throttle = Throttle(args.ops_per_sec)
+    ok = True
+    for migration in pending:
+        if not await run_migration(db, versions, migration, args.batch_size, throttle, args.dry_run):
+            ok = False
+            print("\nStopping; rerun to continue.")
+            break
+
+    if ok and pending and not args.dry_run:
+        print(f"\nSchema version: {await schema_version(versions)}")
+    client.close()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="show applied migrations and exit")
+    parser.add_argument("--to", type=int, help="migrate up to this version (default: latest)")
+    parser.add_argument("--restart", type=int, metavar="VERSION",
+                        help="forget this migration's progress and run it again from the start")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--ops-per-sec", type=float, default=1000, help="write rate limit, 0 for unlimited")
+    parser.add_argument("--dry-run", action="store_true", help="build operations without writing anything")
+    parser.add_argument("--mongo", help="MongoDB URL (default: MONGO_DETAILS)")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
@@ -0,0 +1,6 @@
+from migrations.m001_chat_session_fields import ChatSessionFields
+
+# Applied in this order; versions must be unique and increasing
+MIGRATIONS = [
+    ChatSessionFields,
+]
@@ -0,0 +1,26 @@
+from abc import ABC, abstractmethod
+
+
+class Migration(ABC):
+    """
+    One schema change, applied document by document.
+
+    The runner (scripts/migrate.py) walks `collection` in _id order, in
+    batches, selecting documents that match `query`, and writes whatever
+    `operations` returns for each one with bulk_write. Operations must be
+    idempotent: after a crash the last batch may be applied again.
+    """
+
+    version: int
+    name: str
+    collection: str
+    query: dict = {}
+    projection: dict | None = None
+
+    @abstractmethod
+    def operations(self, doc: dict) -> list:
+        """Write operations on `collection` for one document."""
+
+    async def verify(self, db) -> bool:
+        """Report on the collection after the migration; False marks it failed."""
+        return True
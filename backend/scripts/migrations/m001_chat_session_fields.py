@@ -0,0 +1,60 @@
+"""
+Rename chat_sessions fields (formerly scripts/migrate_chat_sessions.py).
+
+- 'type' -> 'category': "knowledge_base" -> "conversation", "research" -> "search"
+- 'context_type' -> 'mode': "other" -> "general" (thesis stays thesis)
+- Unknown values are carried over as-is
+- Missing category defaults to "conversation", missing mode to "thesis"
+"""
+
+from pymongo import UpdateOne
+
+from migrations.base import Migration
+
+CATEGORY_VALUES = {"knowledge_base": "conversation", "research": "search"}
+MODE_VALUES = {"thesis": "thesis", "other": "general"}
+
+
+class ChatSessionFields(Migration):
+    version = 1
+    name = "chat_session_fields"
+    collection = "chat_sessions"
+    query = {"$or": [
+        {"type": {"$exists": True}},
+        {"context_type": {"$exists": True}},
+        {"category": {"$exists": False}},
+        {"mode": {"$exists": False}}
+    ]}
+    projection = {"type": 1, "context_type": 1, "category": 1, "mode": 1}
+
+    def operations(self, doc: dict) -> list:
+        set_fields, unset_fields = {}, {}
+
+        if "type" in doc:
+            set_fields["category"] = CATEGORY_VALUES.get(doc["type"], doc["type"])
+            unset_fields["type"] = ""
+        elif "category" not in doc:
+            set_fields["category"] = "conversation"
+
+        if "context_type" in doc:
+            set_fields["mode"] = MODE_VALUES.get(doc["context_type"], doc["context_type"])
+            unset_fields["context_type"] = ""
+        elif "mode" not in doc:
+            set_fields["mode"] = "thesis"
+
+        update = {"$set": set_fields}
+        if unset_fields:
+            update["$unset"] = unset_fields
+        return [UpdateOne({"_id": doc["_id"]}, update)]
+
+    async def verify(self, db) -> bool:
+        collection = db[self.collection]
+        for field, value in [("category", "conversation"), ("category", "search"), ("mode", "thesis"), ("mode", "general")]:
+            print(f"  {field}={value}: {await collection.count_documents({field: value})}")
+
+        old_type = await collection.count_documents({"type": {"$exists": True}})
+        old_context = await collection.count_documents({"context_type": {"$exists": True}})
+        if old_type or old_context:
+            print(f"  WARNING: old fields still present ('type': {old_type}, 'context_type': {old_context})")
+            return False
+        return True
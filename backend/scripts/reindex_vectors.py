@@ -0,0 +1,218 @@
+"""
+Rebuild the vector index from saved_research, e.g. after changing
+EMBEDDING_MODEL, CHUNK_SIZE or CHUNK_OVERLAP.
+
+- Streams saved_research in _id order.
+- Reuses the existing vectors of documents whose model and content hash are
+  unchanged; everything else is chunked and embedded in large batches
+  spread over several processes.
+- Checkpoints each finished batch under <VECTOR_INDEX_DIR>/reindex/, so an
+  interrupted run resumes where it stopped.
+- Atomically swaps the rebuilt index in. Running app workers pick it up on
+  their next search.
+
+Changing the embedding model, in this order:
+  1. Keep the app running on the old EMBEDDING_MODEL.
+  2. Run this script with the new EMBEDDING_MODEL set in its environment.
+     Papers the app saves meanwhile are indexed with the old model and
+     re-embedded by this run.
+  3. Restart the app with the new EMBEDDING_MODEL right after the swap.
+     Until then the old app finds nothing (it only searches its own
+     model's vectors), and if the dimension changed its saves are refused
+     rather than overwriting the new index. Their ingestion jobs retry and
+     succeed after the restart. Jobs that ran out of attempts are picked
+     up by running this script again, which reuses everything else.
+Restarting the app on the new model before the swap has the same effect
+on saves in the other direction.
+
+Usage:
+    python scripts/reindex_vectors.py [--batch-size 256] [--processes 4] [--restart]
+
+Run from the backend directory.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.vector_service import VectorService, content_hash, encode_batch
+
+DATABASE_NAME = "research_db"
+
+
+class Checkpoint:
+    """Finished batches of a re-index run, stored as numbered parts."""
+
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.state_file = os.path.join(path, "state.json")
+        self.model = model
+        self.state = {"model": model, "chunk_size": settings.CHUNK_SIZE,
+                      "chunk_overlap": settings.CHUNK_OVERLAP, "last_id": None, "parts": 0}
+
+    def load(self, restart: bool):
+        if restart and os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.makedirs(self.path, exist_ok=True)
+        if os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+            if all(state.get(k) == self.state[k] for k in ("model", "chunk_size", "chunk_overlap")):
+                self.state = state
+                print(f"Resuming after _id {state['last_id']} ({state['parts']} batches done)")
+            else:
+                print("Checkpoint was made with other settings, starting over")
+                shutil.rmtree(self.path)
+                os.makedirs(self.path)
+
+    def add_part(self, records: list, embeddings: np.ndarray, last_id: str):
+        n = self.state["parts"]
+        with open(os.path.join(self.path, f"part-{n}.json"), "w") as f:
+            json.dump(records, f)
+        np.save(os.path.join(self.path, f"part-{n}.npy"), embeddings)
+        self.state.update(last_id=last_id, parts=n + 1)
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_file)
+
+    def parts(self):
+        for n in range(self.state["parts"]):
+            with open(os.path.join(self.path, f"part-{n}.json")) as f:
+                records = json.load(f)
+            yield records, np.load(os.path.join(self.path, f"part-{n}.npy"))
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+async def encode(executor, model_name: str, texts: list[str], processes: int):
+    loop = asyncio.get_running_loop()
+    parts = np.array_split(np.array(texts, dtype=object), min(processes, len(texts)))
+    results = await asyncio.gather(*[
+        loop.run_in_executor(executor, encode_batch, model_name, part.tolist()) for part in parts
+    ])
+    return VectorService._normalize(np.vstack(results).astype(np.float32))
+
+
+async def reindex(batch_size: int, processes: int, restart: bool):
+    vector_service = VectorService()
+    current = vector_service.snapshot()
+    model = vector_service.model_name
+
+    # Existing vectors per document, for reuse when nothing changed
+    existing = {}
+    for i, r in enumerate(current.records):
+        existing.setdefault(r["id"], []).append(i)
+    indexed = current.indexed_hashes()
+
+    checkpoint = Checkpoint(os.path.join(settings.VECTOR_INDEX_DIR, "reindex"), model)
+    checkpoint.load(restart)
+
+    print(f"Connecting to MongoDB: {settings.MONGO_DETAILS}")
+    client = AsyncIOMotorClient(settings.MONGO_DETAILS)
+    collection = client[DATABASE_NAME]["saved_research"]
+
+    query = {"text": {"$nin": [None, ""]}, "duplicate_of": {"$exists": False}}
+    if checkpoint.state["last_id"]:
+        query["_id"] = {"$gt": ObjectId(checkpoint.state["last_id"])}
+    projection = {"title": 1, "text": 1, "user_id": 1, "tags": 1, "is_favorite": 1, "saved_at": 1}
+    cursor = collection.find(query, projection).sort("_id", 1).batch_size(batch_size)
+
+    executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+    reused = embedded = 0
+    batch = []
+
+    async def flush():
+        nonlocal reused, embedded
+        records, embeddings, inputs, pending = [], [], [], []
+        for doc in batch:
+            doc_id = str(doc["_id"])
+            title = doc.get("title") or "Untitled"
+            doc_hash = content_hash(title, doc["text"])
+            metadata = VectorService._filter_metadata(doc)
+            if indexed.get(doc_id) == (model, doc_hash):
+                rows = existing[doc_id]
+                records.extend({**current.full_record(i), **metadata} for i in rows)
+                embeddings.append(np.asarray(current.embeddings[rows], dtype=np.float32))
+                reused += 1
+                continue
+            chunks, chunk_inputs = vector_service.chunk_inputs(title, doc["text"])
+            pending.extend({
+                "id": doc_id, "chunk": i, "user_id": doc["user_id"], "title": title, "text": chunk,
+                "model": model, "content_hash": doc_hash, **metadata
+            } for i, chunk in enumerate(chunks))
+            inputs.extend(chunk_inputs)
+            embedded += 1
+
+        if inputs:
+            vectors = await encode(executor, model, inputs, processes)
+            for r in pending:
+                r["dim"] = vectors.shape[1]
+            records.extend(pending)
+            embeddings.append(vectors)
+
+        if records:
+            checkpoint.add_part(records, np.vstack(embeddings), str(batch[-1]["_id"]))
+        print(f"  {reused} reused, {embedded} embedded")
+        batch.clear()
+
+    try:
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+
+        # Documents deleted while the run was in progress must not come back
+        live_ids = {str(_id) for _id in await collection.distinct("_id")}
+    finally:
+        executor.shutdown()
+        client.close()
+
+    new_records, new_embeddings = [], []
+    for records, embeddings in checkpoint.parts():
+        keep = [i for i, r in enumerate(records) if r["id"] in live_ids]
+        new_records.extend(records[i] for i in keep)
+        new_embeddings.append(embeddings[keep])
+
+    def merge(records, embeddings):
+        # Keep documents the app (re-)indexed with this model while the run was in progress
+        rows = [i for i, r in enumerate(records)
+                if r.get("model") == model and r["id"] in live_ids
+                and (model, r.get("content_hash")) != indexed.get(r["id"])]
+        late_ids = {records[i]["id"] for i in rows}
+        keep = [i for i, r in enumerate(new_records) if r["id"] not in late_ids]
+        merged_records = [new_records[i] for i in keep] + [records[i] for i in rows]
+        all_embeddings = np.vstack(new_embeddings) if new_embeddings else np.zeros((0, 0), dtype=np.float32)
+        parts = [all_embeddings[keep]] if keep else []
+        if rows:
+            parts.append(np.asarray(embeddings[rows], dtype=np.float32))
+        return merged_records, np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+    vector_service.swap(merge)
+    checkpoint.remove()
+    print(f"\nSwapped in generation {vector_service.generation}: "
+          f"{len(vector_service.records)} vectors, {reused} documents reused, {embedded} embedded with {model}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=256, help="documents per embedding batch")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="embedding processes")
+    parser.add_argument("--restart", action="store_true", help="discard any checkpoint and start over")
+    args = parser.parse_args()
+    asyncio.run(reindex(args.batch_size, args.processes, args.restart))
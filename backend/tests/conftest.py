@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Settings refuses to load without these; tests never call the real services
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+os.environ.setdefault("EXA_API_KEY", "test")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "scripts"))  # for `import migrate` / `migrations`
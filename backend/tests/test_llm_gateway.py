@@ -0,0 +1,182 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from anthropic import APIStatusError
+
+from app.services.llm_gateway import CircuitBreaker, LLMGateway, TokenBucket
+
+
+class TestTokenBucket:
+    def test_starts_full_and_takes(self):
+        bucket = TokenBucket(60)
+        asyncio.run(bucket.take(60))
+        assert bucket.level < 1
+
+    def test_refills_at_rate_up_to_capacity(self):
+        bucket = TokenBucket(60)  # one per second
+        bucket.level = 0
+        bucket.updated -= 10
+        bucket._refill()
+        assert 10 <= bucket.level < 11
+        bucket.updated -= 3600
+        bucket._refill()
+        assert bucket.level == 60
+
+    def test_take_waits_for_refill(self):
+        bucket = TokenBucket(6000)  # 100 per second
+        bucket.level = 0
+        started = time.monotonic()
+        asyncio.run(bucket.take(2))
+        assert time.monotonic() - started >= 0.015
+
+    def test_take_larger_than_capacity_waits_for_a_full_bucket(self):
+        bucket = TokenBucket(60)
+        asyncio.run(bucket.take(1000))
+        assert bucket.level < 1
+
+    def test_debit_may_go_negative(self):
+        bucket = TokenBucket(60)
+        bucket.debit(100)
+        assert bucket.level < -39
+
+
+class TestCircuitBreaker:
+    def expire(self, breaker):
+        breaker.opened_at -= breaker.reset_seconds
+
+    def test_opens_after_threshold_consecutive_failures(self):
+        breaker = CircuitBreaker(threshold=3, reset_seconds=30)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == "closed" and breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+    def test_half_open_allows_a_single_trial(self):
+        breaker = CircuitBreaker(threshold=1, reset_seconds=30)
+        breaker.record_failure()
+        self.expire(breaker)
+        assert breaker.state == "half_open"
+        assert breaker.allow()
+        assert not breaker.allow()
+
+    def test_successful_trial_closes(self):
+        breaker = CircuitBreaker(threshold=1, reset_seconds=30)
+        breaker.record_failure()
+        self.expire(breaker)
+        breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed" and breaker.allow()
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(threshold=5, reset_seconds=30)
+        for _ in range(5):
+            breaker.record_failure()
+        self.expire(breaker)
+        breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+
+class FakeMessages:
+    """Stands in for client.messages; fails the first `failures[user]` calls with a 529."""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.calls = []
+
+    async def create(self, **kwargs):
+        user = kwargs["user"]
+        self.calls.append(user)
+        if self.failures.get(user):
+            self.failures[user] -= 1
+            response = httpx.Response(529, request=httpx.Request("POST", "https://api.anthropic.com"))
+            raise APIStatusError("overloaded", response=response, body=None)
+        await asyncio.sleep(0.01)
+        return type("Response", (), {"usage": type("Usage", (), {"output_tokens": 1})()})()
+
+
+def make_gateway(max_concurrency=1, failures=None):
+    gateway = LLMGateway()
+    gateway.max_concurrency = max_concurrency
+    gateway._client = type("Client", (), {"messages": FakeMessages(failures)})()
+    return gateway
+
+
+class TestFairQueue:
+    def test_slots_are_handed_out_round_robin_by_user(self):
+        async def run():
+            gateway = make_gateway()
+            await gateway._acquire("holder")
+            order = []
+
+            async def wait(user, label):
+                await gateway._acquire(user)
+                order.append(label)
+
+            tasks = []
+            for user, label in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("c", "c1")]:
+                tasks.append(asyncio.create_task(wait(user, label)))
+                await asyncio.sleep(0)
+            for _ in tasks:
+                gateway._release()
+                await asyncio.sleep(0)
+            await asyncio.gather(*tasks)
+            gateway._release()
+            return order, gateway
+
+        order, gateway = asyncio.run(run())
+        assert order == ["a1", "b1", "c1", "a2", "a3"]
+        assert gateway.active == 0 and not gateway._waiters
+
+    def test_cancelled_waiter_leaves_the_queue(self):
+        async def run():
+            gateway = make_gateway()
+            await gateway._acquire("holder")
+            waiter = asyncio.create_task(gateway._acquire("a"))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert not gateway._waiters
+            gateway._release()
+            return gateway
+
+        assert asyncio.run(run()).active == 0
+
+    def test_retry_backoff_frees_the_slot(self):
+        async def run():
+            gateway = make_gateway(failures={"a": 1})
+            gateway._backoff = lambda attempt, error: 0.05
+            await asyncio.gather(gateway.create("a", user="a"), gateway.create("b", user="b"))
+            return gateway
+
+        gateway = asyncio.run(run())
+        # b ran while a was backing off, holding no slot
+        assert gateway._client.messages.calls == ["a", "b", "a"]
+        assert gateway.counters["retries"] == 1
+        assert gateway.active == 0
+
+    def test_retries_give_up_and_open_the_breaker(self, monkeypatch):
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 1)
+
+        async def run():
+            gateway = make_gateway(failures={"a": 5})
+            gateway.breaker.threshold = 1
+            gateway._backoff = lambda attempt, error: 0
+            with pytest.raises(APIStatusError):
+                await gateway.create("a", user="a")
+            return gateway
+
+        gateway = asyncio.run(run())
+        assert len(gateway._client.messages.calls) == 2
+        assert gateway.breaker.state == "open"
+        assert gateway.active == 0
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+import migrate
+from migrations import MIGRATIONS
+from migrations.base import Migration
+from migrations.m001_chat_session_fields import ChatSessionFields
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+
+    async def sleep(seconds):
+        recorded.append(seconds)
+
+    monkeypatch.setattr(migrate.asyncio, "sleep", sleep)
+    return recorded
+
+
+class TestThrottle:
+    def test_sleeps_when_ahead_of_the_rate(self, sleeps):
+        throttle = migrate.Throttle(100)
+        asyncio.run(throttle.wait(50))
+        assert len(sleeps) == 1 and 0.4 < sleeps[0] <= 0.5
+        assert throttle.ops == 50
+
+    def test_no_sleep_when_behind_the_rate(self, sleeps):
+        throttle = migrate.Throttle(100)
+        throttle.started -= 10
+        asyncio.run(throttle.wait(500))
+        assert sleeps == []
+
+    def test_rate_is_averaged_over_the_run(self, sleeps):
+        throttle = migrate.Throttle(100)
+        throttle.started -= 1
+        asyncio.run(throttle.wait(100))
+        asyncio.run(throttle.wait(100))
+        assert len(sleeps) == 1 and 0.9 < sleeps[0] <= 1.0
+
+    def test_zero_means_unlimited(self, sleeps):
+        throttle = migrate.Throttle(0)
+        asyncio.run(throttle.wait(10_000))
+        assert sleeps == []
+
+
+class TestChatSessionFields:
+    def update(self, doc):
+        operations = ChatSessionFields().operations({"_id": 1, **doc})
+        assert len(operations) == 1
+        assert operations[0]._filter == {"_id": 1}
+        return operations[0]._doc
+
+    def test_renames_and_maps_old_fields(self):
+        assert self.update({"type": "research", "context_type": "other"}) == {
+            "$set": {"category": "search", "mode": "general"},
+            "$unset": {"type": "", "context_type": ""}
+        }
+        assert self.update({"type": "knowledge_base", "context_type": "thesis"})["$set"] == {
+            "category": "conversation", "mode": "thesis"
+        }
+
+    def test_unknown_values_carry_over(self):
+        assert self.update({"type": "custom", "context_type": "draft"})["$set"] == {
+            "category": "custom", "mode": "draft"
+        }
+
+    def test_missing_fields_get_defaults(self):
+        assert self.update({}) == {"$set": {"category": "conversation", "mode": "thesis"}}
+
+    def test_migrated_fields_are_kept(self):
+        assert self.update({"category": "search", "mode": "general"}) == {"$set": {}}
+        assert self.update({"category": "search", "context_type": "other"}) == {
+            "$set": {"mode": "general"}, "$unset": {"context_type": ""}
+        }
+
+    def test_idempotent(self):
+        first = self.update({"type": "research", "context_type": "other"})
+        assert self.update(first["$set"]) == {"$set": {}}
+
+
+def test_migrations_are_ordered_and_complete():
+    versions = [cls.version for cls in MIGRATIONS]
+    assert versions == sorted(set(versions))
+    with pytest.raises(TypeError):
+        Migration()
@@ -0,0 +1,233 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.models.chat import RetrievalFilters
+from app.services.vector_service import IndexGeneration, VectorService, saved_timestamp
+
+MODEL = "test-model"
+
+
+@pytest.fixture
+def make_service(tmp_path):
+    """Factory for VectorServices sharing one index directory, like uvicorn workers."""
+    def make():
+        service = VectorService()
+        service.index_dir = str(tmp_path / "index")
+        service.legacy_filename = str(tmp_path / "vectors.json")
+        service.model_name = MODEL
+        return service
+    return make
+
+
+def item(doc_id, user_id="u1", chunks=("text",), vector=(1.0, 0.0, 0.0), **metadata):
+    return {
+        "id": doc_id,
+        "user_id": user_id,
+        "title": doc_id.upper(),
+        "chunks": list(chunks),
+        "embeddings": np.tile(np.asarray(vector, dtype=np.float32), (len(chunks), 1)),
+        "content_hash": f"hash-{doc_id}",
+        "metadata": metadata
+    }
+
+
+def manifest(service):
+    with open(service.manifest_path) as f:
+        return json.load(f)
+
+
+def ids(service):
+    return sorted({r["id"] for r in service.snapshot().records})
+
+
+def record(doc_id, user_id="u1", model=MODEL, **fields):
+    return {"id": doc_id, "user_id": user_id, "model": model, **fields}
+
+
+class TestFilterMask:
+    @pytest.fixture
+    def generation(self):
+        day = lambda d: saved_timestamp(datetime(2024, 1, d, tzinfo=timezone.utc))
+        records = [
+            record("a", tags=["ml"], is_favorite=True, saved_at=day(1)),
+            record("b", tags=["bio"], is_favorite=False, saved_at=day(10)),
+            record("c", tags=["ml", "bio"], is_favorite=False, saved_at=None),
+            record("d", user_id="u2", tags=["ml"], is_favorite=True, saved_at=day(1)),
+            record("e", model="old-model", tags=["ml"], is_favorite=True, saved_at=day(1)),
+        ]
+        return IndexGeneration(0, records, np.zeros((len(records), 3), dtype=np.float32))
+
+    def matches(self, generation, filters=None):
+        mask = generation.filter_mask("u1", MODEL, filters)
+        return [r["id"] for r, keep in zip(generation.records, mask) if keep]
+
+    def test_only_own_rows_from_current_model(self, generation):
+        assert self.matches(generation) == ["a", "b", "c"]
+
+    def test_any_of_the_tags(self, generation):
+        assert self.matches(generation, RetrievalFilters(tags=["bio"])) == ["b", "c"]
+        assert self.matches(generation, RetrievalFilters(tags=["ml", "bio"])) == ["a", "b", "c"]
+        assert self.matches(generation, RetrievalFilters(tags=["none"])) == []
+
+    def test_favorites_only(self, generation):
+        assert self.matches(generation, RetrievalFilters(favorites_only=True)) == ["a"]
+
+    def test_saved_range_excludes_undated_papers(self, generation):
+        after = RetrievalFilters(saved_after=datetime(2024, 1, 5))  # naive means UTC
+        assert self.matches(generation, after) == ["b"]
+        before = RetrievalFilters(saved_before=datetime(2024, 1, 10, tzinfo=timezone.utc))
+        assert self.matches(generation, before) == ["a"]
+
+    def test_combined(self, generation):
+        filters = RetrievalFilters(tags=["ml"], saved_after=datetime(2023, 12, 31))
+        assert self.matches(generation, filters) == ["a"]
+
+
+class TestGenerations:
+    def test_publish_and_refresh_across_workers(self, make_service):
+        writer, reader = make_service(), make_service()
+        writer.upsert_many([item("a")])
+        assert ids(reader) == ["a"]
+
+        writer.upsert_many([item("b", chunks=["one", "two"])])
+        assert manifest(writer)["generation"] == 1
+        assert ids(reader) == ["a", "b"]
+        assert reader.generation == 1
+
+    def test_upsert_replaces_a_documents_chunks(self, make_service):
+        service = make_service()
+        service.upsert_many([item("a", chunks=["one", "two", "three"])])
+        service.upsert_many([item("a", chunks=["only"])])
+        current = service.snapshot()
+        assert [current.text(i) for i in range(len(current.records))] == ["only"]
+
+    def test_search_returns_chunk_text(self, make_service):
+        service = make_service()
+        service.upsert_many([item("a", chunks=["ünïcode chunk"]), item("b", vector=(0.0, 1.0, 0.0))])
+        service._model = type("Model", (), {"encode": lambda self, q, **kw: np.array([1.0, 0.0, 0.0])})()
+        results = service.search("query", "u1", n_results=1)
+        assert [(r["id"], r["text"]) for r in results] == [("a", "ünïcode chunk")]
+
+    def test_delete_only_touches_the_owner(self, make_service):
+        service = make_service()
+        service.upsert_many([item("a", user_id="u1"), item("b", user_id="u2")])
+        service.delete("b", "u1")
+        assert ids(service) == ["a", "b"]
+        service.delete("b", "u2")
+        assert ids(service) == ["a"]
+
+    def test_metadata_only_generation_reuses_loaded_records(self, make_service):
+        writer, reader = make_service(), make_service()
+        writer.upsert_many([item("a", tags=["x"])])
+        before = reader.snapshot()
+
+        writer.update_metadata("a", "u1", {"tags": ["y"], "is_favorite": True})
+        files = manifest(writer)
+        assert files["records"] == before.files["records"]
+        after = reader.snapshot()
+        assert after.number == before.number + 1
+        assert after.embeddings is before.embeddings
+        assert after.texts is before.texts
+        assert after.records[0]["tags"] == ["y"] and after.records[0]["is_favorite"]
+
+    def test_unchanged_metadata_publishes_nothing(self, make_service):
+        service = make_service()
+        service.upsert_many([item("a", tags=["x"])])
+        service.update_metadata("a", "u1", {"tags": ["x"]})
+        assert service.generation == 0
+
+    def test_gc_keeps_current_and_previous_generation(self, make_service):
+        service = make_service()
+        for n in range(4):
+            service.upsert_many([item(f"d{n}")])
+        service.update_metadata("d0", "u1", {"tags": ["t"]})  # generation 4, reuses records-3
+
+        names = set(os.listdir(service.index_dir))
+        for prefix, ext in [("records", "json"), ("embeddings", "npy"), ("texts", "npy"), ("offsets", "npy")]:
+            assert {f"{prefix}-{n}.{ext}" for n in range(4)} & names == {f"{prefix}-3.{ext}"}
+        assert {f"meta-{n}.json" for n in range(5)} & names == {"meta-3.json", "meta-4.json"}
+
+    def test_refresh_survives_gc_of_the_generation_it_read(self, make_service):
+        writer, reader = make_service(), make_service()
+        writer.upsert_many([item("a")])
+        reader.snapshot()
+        for n in range(3):
+            writer.upsert_many([item(f"d{n}")])
+        assert ids(reader) == ["a", "d0", "d1", "d2"]
+
+    def test_legacy_vectors_json_is_imported(self, make_service, tmp_path):
+        legacy = [{"id": "old", "user_id": "u1", "title": "Old", "text": "legacy text", "embedding": [0.0, 3.0, 4.0]}]
+        (tmp_path / "vectors.json").write_text(json.dumps(legacy))
+        service = make_service()
+        current = service.snapshot()
+        assert current.number == 0
+        assert current.text(0) == "legacy text"
+        assert np.allclose(current.embeddings[0], [0.0, 0.6, 0.8])
+
+
+class TestWriteSafety:
+    def test_writes_refused_after_failed_load(self, make_service):
+        writer = make_service()
+        writer.upsert_many([item("a"), item("b", user_id="u2")])
+        with open(os.path.join(writer.index_dir, manifest(writer)["metadata"]), "w") as f:
+            f.write("{truncated")
+
+        worker = make_service()
+        with pytest.raises(RuntimeError):
+            worker.upsert_many([item("c")])
+        with pytest.raises(RuntimeError):
+            worker.delete("a", "u1")
+        with pytest.raises(RuntimeError):
+            worker.update_metadata("a", "u1", {"tags": ["x"]})
+        with pytest.raises(RuntimeError):
+            worker.swap(lambda records, embeddings: (records, embeddings))
+        assert manifest(writer)["generation"] == 0
+
+    def test_writes_refused_after_failed_legacy_import(self, make_service, tmp_path):
+        (tmp_path / "vectors.json").write_text("[{broken")
+        service = make_service()
+        with pytest.raises(RuntimeError):
+            service.upsert_many([item("a")])
+        assert not os.path.exists(service.manifest_path)
+
+    def test_failed_refresh_keeps_serving_and_refuses_writes(self, make_service):
+        writer, worker = make_service(), make_service()
+        writer.upsert_many([item("a")])
+        assert ids(worker) == ["a"]
+        writer.upsert_many([item("b")])
+        with open(os.path.join(writer.index_dir, manifest(writer)["records"]), "w") as f:
+            f.write("[")
+
+        assert ids(worker) == ["a"]
+        with pytest.raises(RuntimeError):
+            worker.upsert_many([item("c")])
+
+    def test_publish_refuses_a_generation_not_newer_than_the_manifest(self, make_service):
+        service = make_service()
+        service.upsert_many([item("a")])
+        service.upsert_many([item("b")])
+        stale = IndexGeneration(0, [], np.zeros((0, 0), dtype=np.float32))
+        with pytest.raises(RuntimeError):
+            service._publish(stale, [], np.zeros((0, 0), dtype=np.float32))
+        assert manifest(service)["generation"] == 1
+
+    def test_late_install_never_rolls_back(self, make_service):
+        service = make_service()
+        service.upsert_many([item("a")])
+        loaded_late = service._load_generation(manifest(service))
+        service.upsert_many([item("b")])
+
+        service._install(loaded_late)
+        assert service.generation == 1
+        assert ids(service) == ["a", "b"]
+
+    def test_dimension_change_is_refused(self, make_service):
+        service = make_service()
+        service.upsert_many([item("a")])
+        with pytest.raises(ValueError):
+            service.upsert_many([item("b", vector=(1.0, 0.0))])
+        assert ids(service) == ["a"]
@@ -51,3 +51,12 @@ export const updateSessionResults = async (sessionId, results) => {
     const response = await client.put(`/chats/${sessionId}/results`, { results });
     return response.data;
 };
+
+/**
+ * Get a page of a search session's results.
+ * Session listings omit results; they are loaded here when a search is opened.
+ */
+export const getSessionResults = async (sessionId, offset = 0, limit = 50) => {
+    const response = await client.get(`/chats/${sessionId}/results`, { params: { offset, limit } });
+    return response.data;
+};
@@ -5,9 +5,20 @@ export const searchExa = async (query) => {
     return response.data;
 };
 
+/**
+ * Get the whole library (without full text), following pagination cursors.
+ * Unchanged pages are revalidated by the browser cache via ETag.
+ */
 export const getSavedResults = async () => {
-    const response = await client.get('/knowledge/saved-results');
-    return response.data;
+    const items = [];
+    let after = null;
+    do {
+        const params = after ? { limit: 200, after } : { limit: 200 };
+        const response = await client.get('/knowledge/saved-results', { params });
+        items.push(...response.data.items);
+        after = response.data.next_cursor;
+    } while (after);
+    return items;
 };
 
 export const saveResult = async (result) => {
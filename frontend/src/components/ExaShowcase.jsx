@@ -25,15 +25,19 @@ export default function ExaShowcase({ token, handleLogout }) {
     const [previewExpanded, setPreviewExpanded] = useState(false);
     const [showAllResults, setShowAllResults] = useState(false);
 
-    const selectSearch = useCallback((search) => {
+    const selectSearch = useCallback(async (search) => {
         setCurrentSearchId(search.id);
         sessionStorage.setItem("active_search_id", search.id);
         setQuery(search.title);
-        // Searches store results in 'results' list, Exa expects { results: [...] }
-        if (search.results && search.results.length > 0) {
-            setResults({ results: search.results });
-        } else {
-            setResults(null);
+        setResults(null);
+        // Results are not part of the session listing; fetch them for this search only
+        try {
+            const data = await chatApi.getSessionResults(search.id);
+            if (data.results.length > 0 && sessionStorage.getItem("active_search_id") === search.id) {
+                setResults({ results: data.results });
+            }
+        } catch (err) {
+            console.error("Failed to load search results", err);
         }
     }, []);
 